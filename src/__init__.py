@@ -1,9 +1,13 @@
-from src.races import RandomWalk, ValueIteration, QLearning, SARSA
+from src.races import RandomWalk, ValueIteration, QLearning, DynaQ, QLambda, SARSA, SARSALambda, VecRace
 
 
 __all__ = [
     'RandomWalk',
     'ValueIteration',
     'QLearning',
-    'SARSA'
+    'DynaQ',
+    'QLambda',
+    'SARSA',
+    'SARSALambda',
+    'VecRace'
 ]
@@ -0,0 +1,211 @@
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from typing import Callable, Dict, List, Tuple
+
+from src.car import Car
+from src.track import Track
+from src.tables import QTable
+from src.generate import generate_track
+from src.render import Renderer
+from src.races.abstract import AbstractRace
+from src.races.value_iteration import ValueIteration
+
+TRACK_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tracks')
+
+
+def _timed(fn: Callable[[], None], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def ring_track(size: int, width: int = 4) -> Track:
+    '''
+    Build a square ring track with the start and finish lines on either
+    side of a wall across the bottom of the ring.
+
+    :param size: the side length of the track
+    :param width: the width of the ring's corridor
+    :return: the track
+    '''
+    grid = [[False] * size for _ in range(size)]
+    for x in range(1, size - 1):
+        for y in range(1, size - 1):
+            grid[x][y] = x <= width or x >= size - 1 - width or y <= width or y >= size - 1 - width
+
+    # block the ring between the start and finish lines
+    wall = size // 2
+    for x in range(size - 1 - width, size - 1):
+        grid[x][wall] = False
+
+    start = [(x, wall - 1) for x in range(size - 1 - width, size - 1)]
+    finish = [(x, wall + 1) for x in range(size - 1 - width, size - 1)]
+    return Track(size, size, grid, start, finish)
+
+
+def _queries(track: Track, count: int, reach: int) -> List[Tuple[int, int, int, int]]:
+    cells = [(x, y) for (x, y) in np.argwhere(~track.walls).tolist()]
+    queries = []
+    for _ in range(count):
+        x_o, y_o = random.choice(cells)
+        queries.append((x_o, y_o, x_o + random.randint(-reach, reach), y_o + random.randint(-reach, reach)))
+    return queries
+
+
+def bench_track(track: Track, steps: int, repeat: int) -> Dict[str, float]:
+    '''
+    Run every benchmark against a single track.
+
+    :param track: the track
+    :param steps: the number of operations to time per benchmark
+    :param repeat: the number of times to repeat each timing (the best is kept)
+    :return: the results keyed by metric
+    '''
+    results: Dict[str, float] = {'cells': track._x_max * track._y_max}
+    queries = _queries(track, steps, reach=4)
+
+    # geometry queries on the track
+    results['is_valid_per_sec'] = steps / _timed(lambda: [track.is_valid(*q) for q in queries], repeat)
+    results['reached_finish_per_sec'] = steps / _timed(lambda: [track.reached_finish(*q) for q in queries], repeat)
+
+    def nearest_valid():
+        track._nearest.clear()
+        for q in queries:
+            track.nearest_valid(*q)
+    results['nearest_valid_per_sec'] = steps / _timed(nearest_valid, repeat)
+
+    # building the reachable states and their transitions
+    start = time.perf_counter()
+    transitions = track.transitions
+    results['transitions_build_sec'] = time.perf_counter() - start
+    results['states'] = len(transitions.index)
+    results['transitions_bytes'] = transitions.next_state.nbytes + transitions.flags.nbytes + transitions.index.nbytes
+
+    # raw car and environment steps
+    accelerations = [(random.randint(-1, 1), random.randint(-1, 1)) for _ in range(steps)]
+
+    def car_steps():
+        car = Car(0, 0)
+        for (a_x, a_y) in accelerations:
+            car.set_acceleration(a_x, a_y)
+    results['car_steps_per_sec'] = steps / _timed(car_steps, repeat)
+
+    race = AbstractRace(track, renderer=Renderer())
+    race.history.record = False
+
+    def moves():
+        race.car.x, race.car.y = track.starting_point
+        race.car.zeroize()
+        for (a_x, a_y) in accelerations:
+            if race.move(a_x, a_y):
+                race.car.x, race.car.y = track.starting_point
+                race.car.zeroize()
+    results['move_steps_per_sec'] = steps / _timed(moves, repeat)
+
+    # tabular learner allocation
+    def q_table():
+        QTable.random(track.state_index, scale=-1.0)
+    results['q_table_build_sec'] = _timed(q_table, repeat)
+    tracemalloc.start()
+    table = QTable.random(track.state_index, scale=-1.0)
+    results['q_table_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    results['q_table_bytes'] = table.nbytes
+
+    # full value iteration sweeps
+    planner = ValueIteration(track, renderer=Renderer())
+    sweeps = 10
+    results['vi_sweeps_per_sec'] = sweeps / _timed(lambda: [planner.backup(planner.states).max(axis=1) for _ in range(sweeps)], repeat)
+
+    # full solves, where the backup counts only mean something next to the time they took
+    for (name, options) in [('sync', {}), ('prioritized', {'solver': 'prioritized'}), ('multigrid', {'multigrid': 1})]:
+        planner = ValueIteration(track, renderer=Renderer(), **options)
+        planner.train()
+        results[f'vi_{name}_backups'] = planner.backups
+        results[f'vi_{name}_solve_sec'] = planner.solve_sec
+
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    '''
+    Find the metrics that got worse than the baseline by more than the
+    tolerance. Rates (*_per_sec) should not drop and everything measured in
+    seconds or bytes should not grow.
+
+    :param results: the new results
+    :param baseline: the saved results to compare against
+    :param tolerance: the allowed relative change
+    :return: a description of every regression
+    '''
+    regressions = []
+    for (track, metrics) in results.items():
+        for (metric, value) in metrics.items():
+            old = baseline.get(track, {}).get(metric)
+            if not old:
+                continue
+            if metric.endswith('_per_sec'):
+                change = (old - value) / old
+            elif metric.endswith('_sec') or metric.endswith('_bytes'):
+                change = (value - old) / old
+            else:
+                continue
+            if change > tolerance:
+                regressions.append(f'{track} {metric}: {old:.4g} -> {value:.4g} ({change:.0%} worse)')
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the environment, learners and planners.')
+    parser.add_argument('--tracks', nargs='*', default=sorted(glob.glob(os.path.join(TRACK_DIR, '*.txt'))))
+    parser.add_argument('--synthetic', nargs='*', type=int, default=[64, 128], help='sizes of synthetic ring tracks')
+    parser.add_argument('--generated', nargs='*', type=int, default=[], help='sizes of generated tracks, seeded by --seed')
+    parser.add_argument('--steps', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against results saved with --output')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    tracks = [(os.path.basename(path), Track.from_file(path)) for path in args.tracks]
+    tracks += [(f'ring-{size}', ring_track(size)) for size in args.synthetic]
+    tracks += [(f'generated-{size}', generate_track(size, size, seed=args.seed)) for size in args.generated]
+
+    results = {}
+    for (name, track) in tracks:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+        track.rng.seed(args.seed)
+        results[name] = bench_track(track, args.steps, args.repeat)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
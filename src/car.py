@@ -1,18 +1,19 @@
-import random
+from typing import Optional, Tuple
 
-from typing import Tuple
+from src.rng import RandomStream
 
 
 class Car:
 
-    def __init__(self, x_initial: int, y_initial: int):
+    def __init__(self, x_initial: int, y_initial: int, rng: Optional[RandomStream] = None):
+        self.rng: RandomStream = rng if rng is not None else RandomStream()
         self.x: int = x_initial
         self.y: int = y_initial
         self.v_x: int = 0
         self.v_y: int = 0
 
     def _can_change(self):
-        return random.random() < 0.8
+        return self.rng.random() < 0.8
 
     def _update_x(self, a_x: int):
         # update the velocity if in acceptable range
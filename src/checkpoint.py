@@ -0,0 +1,77 @@
+import os
+import json
+import shutil
+
+import numpy as np
+
+from typing import Any, Dict, Tuple
+
+from src.states import StateIndex
+
+CHECKPOINT_DIR: str = os.environ.get('CHECKPOINT_DIR', 'checkpoints')
+CHECKPOINT_EVERY: int = int(os.environ.get('CHECKPOINT_EVERY', 0))
+
+
+def _previous(path: str) -> str:
+    # where the last checkpoint is moved while the new one is swapped in
+    return path.rstrip(os.sep) + '.old'
+
+
+def save_checkpoint(path: str, index: StateIndex, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> None:
+    '''
+    Write a checkpoint directory holding one .npy file per array (so each can
+    be memory-mapped on load), the states the arrays are indexed by and a
+    JSON file of everything else. The directory is written aside, the last
+    checkpoint is moved to path.old and the new one renamed into place, so
+    an interrupted save always leaves one complete checkpoint behind.
+
+    :param path: the checkpoint directory
+    :param index: the state index the arrays are laid out against
+    :param arrays: the arrays to store
+    :param meta: JSON-serializable values to store
+    '''
+    staging, previous = path.rstrip(os.sep) + '.tmp', _previous(path)
+
+    # finish the swap of a save that was interrupted after moving the last checkpoint aside
+    if not os.path.exists(path) and os.path.exists(previous):
+        os.replace(previous, path)
+    shutil.rmtree(previous, ignore_errors=True)
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    for (name, array) in arrays.items():
+        np.save(os.path.join(staging, f'{name}.npy'), np.asarray(array))
+    np.save(os.path.join(staging, 'index.npy'), index.states)
+
+    meta = dict(meta, arrays=sorted(arrays))
+    with open(os.path.join(staging, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    if os.path.exists(path):
+        os.replace(path, previous)
+    os.replace(staging, path)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def load_checkpoint(path: str, index: StateIndex, mmap_mode: str = 'c') -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    '''
+    Read a checkpoint directory written by save_checkpoint, or the one it
+    moved aside if a save was interrupted before the new one took its place.
+
+    :param path: the checkpoint directory
+    :param index: the state index the arrays must match
+    :param mmap_mode: how to memory-map the arrays ('c' maps them copy-on-write
+                      so they can be trained further without touching the file)
+    :return: the arrays and the remaining values
+    '''
+    if not os.path.exists(path) and os.path.exists(_previous(path)):
+        path = _previous(path)
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+
+    if not np.array_equal(np.load(os.path.join(path, 'index.npy'), mmap_mode='r'), index.states):
+        raise ValueError(f'Checkpoint {path} was saved against a different set of states')
+
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in meta['arrays']}
+    return arrays, meta
+
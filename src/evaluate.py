@@ -0,0 +1,114 @@
+import numpy as np
+
+from typing import NamedTuple
+
+from src.track import Track
+from src.transitions import CRASHED, FINISHED, STAY
+
+# the chance that the chosen acceleration applies, and that it fails
+P_ACCEL: float = 0.8
+P_NO_ACCEL: float = 0.2
+
+
+class PolicyEvaluation(NamedTuple):
+    expected_steps: np.ndarray  # expected steps to finish from every state, inf if it may never finish
+    start_steps: np.ndarray  # expected steps from every starting point at zero velocity
+    mean_steps: float  # expected steps from a random starting point
+    reachable: np.ndarray  # whether each state can be visited from a starting point
+    cycling: np.ndarray  # reachable states that can end up circling without finishing
+    iterations: int
+    converged: bool
+
+    def summary(self) -> str:
+        return (
+            f'expected steps from the start: {self.mean_steps:.2f} '
+            f'(best {self.start_steps.min():.2f}, worst {self.start_steps.max():.2f}), '
+            f'{int(self.reachable.sum())} reachable states, {int(self.cycling.sum())} cycling, '
+            f'{len(self.reachable) - int(self.reachable.sum())} unreachable, '
+            f'{"converged" if self.converged else "not converged"} after {self.iterations} iterations'
+        )
+
+
+def evaluate_policy(track: Track, policy: np.ndarray, harsh: bool = False, tol: float = 1e-6, max_iters: int = 100000) -> PolicyEvaluation:
+    '''
+    Compute the expected number of steps a greedy policy takes to finish
+    from every state by solving its Markov chain: the chosen acceleration
+    applies with probability 0.8 and otherwise the car stays where it is
+    with the same velocity. States that can reach a loop the policy never
+    leaves are found first and marked with infinite steps, so the rest of
+    the chain is guaranteed to converge.
+
+    :param track: the track the policy was learned on
+    :param policy: the action column (3 * ai_x + ai_y) of every state index
+    :param harsh: whether crashing sends the car back to a random starting point
+    :param tol: stop once no expected step count changes by more than this
+    :param max_iters: the most iterations to run
+    :return: the evaluation
+    '''
+    index, transitions = track.state_index, track.transitions
+    n = len(index)
+    states = np.arange(n)
+    starts = np.array([index.index(x, y, 0, 0) for (x, y) in track._starting_points])
+
+    # the two outcomes of every state: the policy's acceleration applying and failing
+    columns = np.stack([np.asarray(policy, dtype=np.int64), np.full(n, STAY)], axis=1)
+    successors = transitions.next_state[states[:, None], columns].astype(np.int64)
+    flags = transitions.flags[states[:, None], columns]
+    finished = (flags & FINISHED) != 0
+    reset = ~finished & ((flags & CRASHED) != 0) if harsh else np.zeros_like(finished)
+    moves = ~finished & ~reset
+    probabilities = np.array([P_ACCEL, P_NO_ACCEL])
+
+    def leads_into(mask: np.ndarray) -> np.ndarray:
+        # whether any outcome of each state lands in the masked states
+        return (moves & mask[successors]).any(axis=1) | (reset.any(axis=1) & mask[starts].any())
+
+    # the states that might finish, then the ones that might reach a state that never can
+    can_finish = finished.any(axis=1)
+    while True:
+        grown = can_finish | leads_into(can_finish)
+        if (grown == can_finish).all():
+            break
+        can_finish = grown
+    stuck = ~can_finish
+    while True:
+        grown = stuck | leads_into(stuck)
+        if (grown == stuck).all():
+            break
+        stuck = grown
+
+    # the states visited from the starting points
+    reachable = np.zeros(n, dtype=bool)
+    reachable[starts] = True
+    while True:
+        grown = reachable.copy()
+        grown[successors[moves & reachable[:, None]]] = True
+        if (reset & reachable[:, None]).any():
+            grown[starts] = True
+        if (grown == reachable).all():
+            break
+        reachable = grown
+
+    # iterate the expected step counts of the states that finish for sure
+    expected = np.where(stuck, np.inf, 0.0)
+    finite = ~stuck
+    iterations, converged = 0, not finite.any()
+    while not converged and iterations < max_iters:
+        outcomes = np.where(moves, expected[successors], 0.0)
+        if harsh:
+            outcomes = np.where(reset, expected[starts].mean(), outcomes)
+        updated = np.where(stuck, np.inf, 1.0 + outcomes @ probabilities)
+        converged = float(np.abs(updated[finite] - expected[finite]).max()) < tol
+        expected = updated
+        iterations += 1
+
+    start_steps = expected[starts]
+    return PolicyEvaluation(
+        expected_steps=expected,
+        start_steps=start_steps,
+        mean_steps=float(start_steps.mean()),
+        reachable=reachable,
+        cycling=reachable & stuck,
+        iterations=iterations,
+        converged=converged
+    )
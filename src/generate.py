@@ -0,0 +1,100 @@
+import sys
+import argparse
+
+import numpy as np
+
+from typing import List, Optional
+
+from src.track import Track
+
+# rounds of corner cutting applied to bent segments
+SMOOTHING: int = 3
+
+
+def _smooth(points: np.ndarray, rounds: int) -> np.ndarray:
+    # chaikin corner cutting, keeping both ends in place
+    for _ in range(rounds):
+        p, q = points[:-1], points[1:]
+        cut = np.stack([0.75 * p + 0.25 * q, 0.25 * p + 0.75 * q], axis=1).reshape(-1, 2)
+        points = np.concatenate([points[:1], cut, points[-1:]])
+    return points
+
+
+def _stamp(mask: np.ndarray, centers: np.ndarray, width: int) -> None:
+    # mark a width x width square around every center
+    offsets = np.stack(np.meshgrid(np.arange(-(width // 2), width - width // 2), np.arange(-(width // 2), width - width // 2), indexing='ij'), axis=-1).reshape(-1, 2)
+    cells = (centers[:, None, :] + offsets[None, :, :]).reshape(-1, 2)
+    cells[:, 0] = cells[:, 0].clip(1, mask.shape[0] - 2)
+    cells[:, 1] = cells[:, 1].clip(1, mask.shape[1] - 2)
+    mask[cells[:, 0], cells[:, 1]] = True
+
+
+def generate_track(x_max: int, y_max: int, width: int = 4, turns: int = 4, curvature: float = 0.3, seed: Optional[int] = None) -> Track:
+    '''
+    Generate a track by carving a corridor along a random path of waypoints,
+    with the starting line at one end and the finish line at the other. The
+    corridor is carved continuously from start to finish, so there is always
+    a route between them.
+
+    :param x_max: the number of rows
+    :param y_max: the number of columns
+    :param width: the width of the corridor
+    :param turns: the number of waypoints the path turns at
+    :param curvature: how far each straight stretch is bent, as a fraction of its length
+    :param seed: seeds the layout
+    :return: the track
+    '''
+    if width < 1 or min(x_max, y_max) < 4 * width + 4:
+        raise ValueError(f'A {x_max}x{y_max} track is too small for a corridor of width {width}')
+    rng = np.random.default_rng(seed)
+
+    # pick the waypoints, keeping the finish clear of the start
+    margin = width // 2 + 1
+    low, high = np.array([margin, margin]), np.array([x_max - 1 - margin, y_max - 1 - margin])
+    waypoints = rng.uniform(low, high, size=(turns + 2, 2))
+    while np.linalg.norm(waypoints[-1] - waypoints[0]) < 2 * width:
+        waypoints[-1] = rng.uniform(low, high)
+
+    # bend every stretch by pushing its midpoint sideways, then round it off
+    points = [waypoints[0]]
+    for (p, q) in zip(waypoints[:-1], waypoints[1:]):
+        normal = np.array([p[1] - q[1], q[0] - p[0]])
+        points += [np.clip((p + q) / 2 + normal * curvature * rng.uniform(-0.5, 0.5), low, high), q]
+    points = np.array(points)
+    if curvature > 0:
+        points = _smooth(points, SMOOTHING)
+
+    # sample the path at least twice per cell so the carved corridor has no gaps
+    samples = [points[:1]]
+    for (p, q) in zip(points[:-1], points[1:]):
+        steps = int(np.ceil(2 * np.linalg.norm(q - p))) + 1
+        samples.append(p + np.linspace(0, 1, steps)[1:, None] * (q - p))
+    centers = np.rint(np.concatenate(samples)).astype(np.int64)
+
+    drivable = np.zeros((x_max, y_max), dtype=bool)
+    _stamp(drivable, centers, width)
+    start = np.zeros_like(drivable)
+    _stamp(start, centers[:1], width)
+    finish = np.zeros_like(drivable)
+    _stamp(finish, centers[-1:], width)
+    finish &= ~start
+
+    return Track(x_max, y_max, drivable, np.argwhere(start), np.argwhere(finish))
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Generate a random track file.')
+    parser.add_argument('output')
+    parser.add_argument('--size', nargs=2, type=int, default=[64, 64], metavar=('X_MAX', 'Y_MAX'))
+    parser.add_argument('--width', type=int, default=4)
+    parser.add_argument('--turns', type=int, default=4)
+    parser.add_argument('--curvature', type=float, default=0.3)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    generate_track(*args.size, args.width, args.turns, args.curvature, args.seed).to_file(args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
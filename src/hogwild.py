@@ -0,0 +1,152 @@
+import sys
+import time
+import queue
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Union
+
+from src.tables import QTable
+from src.render import Renderer
+from src.parallel import WORKERS
+from src.races import QLearning, SARSA
+
+# workers inherit the learner, track and shared table mapping by forking
+_context = multiprocessing.get_context('fork')
+# how often the parent checks on the workers and, when early stopping, on convergence
+POLL_SEC: float = 0.1
+
+
+def _worker(learner: Union[QLearning, SARSA], claimed, stop, epsilon: float, first: int, seed: np.random.SeedSequence, results) -> None:
+    learner.rng.seed(seed)
+    learner.renderer = Renderer()
+    learner.checkpoint_every = 0
+    learner.loss_values = []
+
+    # convergence is checked once, by the parent, rather than by every worker
+    learner.monitor = None
+
+    episodes: List[int] = []
+    while True:
+        # claim the next episode of the shared budget
+        with claimed.get_lock():
+            episode = claimed.value
+            if episode >= learner.training_iters or stop.value:
+                break
+            claimed.value += 1
+
+        # follow the global epsilon schedule rather than this worker's own count
+        learner.episode = episode
+        learner.epsilon = epsilon - learner.decay * (episode - first)
+        before = len(learner.loss_values)
+        learner.train(episodes=1)
+        if len(learner.loss_values) > before:
+            episodes.append(episode)
+
+    results.put((episodes, learner.loss_values))
+
+
+def train_shared(learner: Union[QLearning, SARSA], workers: int = WORKERS, seed: Optional[int] = None) -> None:
+    '''
+    Train a QLearning or SARSA learner up to its training_iters with several
+    worker processes running episodes at once. The Q table is moved into
+    shared memory and every worker updates it in place without locking
+    (Hogwild), while the episode budget and epsilon schedule are coordinated
+    through a shared episode counter. When the learner has a convergence
+    monitor, this process runs it against the shared table as episodes are
+    claimed and stops the workers from claiming more once it converges.
+
+    :param learner: the learner to train, picking up from its current episode
+    :param workers: the number of worker processes
+    :param seed: seeds the workers' random generators, which are otherwise
+                 drawn from fresh entropy
+    '''
+    first, epsilon = learner.episode, learner.epsilon
+    if first >= learner.training_iters or learner.converged:
+        return
+
+    # move the Q table into shared memory
+    values = learner.Q.values
+    shm = SharedMemory(create=True, size=values.nbytes)
+    try:
+        shared = np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)
+        shared[:] = values
+        precision = learner.Q.precision
+        learner.Q = QTable(learner.track.state_index, shared, precision)
+
+        claimed = _context.Value('q', first)
+        stop = _context.Value('b', False)
+        results = _context.Queue()
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        processes = [
+            _context.Process(target=_worker, args=(learner, claimed, stop, epsilon, first, seeds[i], results))
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        # gather the losses of every worker before waiting on them, in episode order
+        losses: Dict[int, int] = {}
+        pending = workers
+        while pending:
+            try:
+                episodes, loss_values = results.get(timeout=POLL_SEC)
+            except queue.Empty:
+                if any(process.exitcode for process in processes):
+                    for process in processes:
+                        process.terminate()
+                    raise RuntimeError('A training worker exited without finishing')
+
+                # check the live table for convergence as the episodes are claimed
+                if learner.monitor is not None and not stop.value:
+                    learner.episode = claimed.value
+                    stop.value = learner.monitor.update(learner)
+                continue
+            losses.update(zip(episodes, loss_values))
+            pending -= 1
+        for process in processes:
+            process.join()
+        last = claimed.value
+
+        # bring the learned table back into private memory
+        learner.Q = QTable(learner.track.state_index, shared.copy(), precision)
+        if learner.converged:
+            # workers may have finished their episodes after the best table was put back
+            learner.monitor.restore_best(learner)
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+
+    learner.loss_values.extend(losses[episode] for episode in sorted(losses))
+    learner.episode = last
+    learner.epsilon = epsilon - learner.decay * (last - first)
+    learner.autosave(last - first)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Train a learner with several workers sharing one Q table.')
+    parser.add_argument('algorithm', choices=['QLearning', 'SARSA'])
+    parser.add_argument('trackfile')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--race', action='store_true', help='race the trained policy afterwards')
+    args = parser.parse_args(argv)
+
+    learner = {'QLearning': QLearning, 'SARSA': SARSA}[args.algorithm](args.trackfile)
+    start = time.perf_counter()
+    train_shared(learner, args.workers, args.seed)
+    losses = learner.loss_values[-100:]
+    print(f'trained {learner.episode} episodes in {time.perf_counter() - start:.2f}s, '
+          f'mean loss over the last {len(losses)}: {np.mean(losses):.1f}')
+
+    if args.race:
+        learner.race()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,98 @@
+import os
+import csv
+import json
+import time
+
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+PROFILE: bool = os.environ.get('PROFILE', 'false').lower() == 'true'
+PROFILE_INTERVAL: float = float(os.environ.get('PROFILE_INTERVAL', 10))
+PROFILE_OUTPUT: Optional[str] = os.environ.get('PROFILE_OUTPUT')
+
+# the columns written to CSV snapshots, whether or not they have been hit yet
+FIELDS = [
+    'elapsed', 'steps_per_sec', 'crash_rate',
+    'steps', 'crashes', 'finishes', 'episodes', 'nearest_valid', 'backups',
+    'select_sec', 'move_sec', 'update_sec', 'sweep_sec'
+]
+
+
+class Profiler:
+    '''
+    Per-phase timers and event counters for the training loops. Phases are
+    timed as laps: each call to lap charges the time since the previous lap
+    to the named phase. Every hook returns immediately when disabled.
+    '''
+
+    def __init__(self, enabled: bool = PROFILE, interval: float = PROFILE_INTERVAL, output: Optional[str] = PROFILE_OUTPUT):
+        self.enabled: bool = enabled
+        self.interval: float = interval
+        self.output: Optional[str] = output
+        self.reset()
+
+    def reset(self) -> None:
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.timers: Dict[str, float] = defaultdict(float)
+        self._started: float = time.perf_counter()
+        self._last_lap: float = self._started
+        self._last_export: float = self._started
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] += n
+
+    def start(self) -> None:
+        '''
+        Mark the beginning of a timed region without charging any phase.
+        '''
+        if self.enabled:
+            self._last_lap = time.perf_counter()
+
+    def lap(self, name: str) -> None:
+        if self.enabled:
+            now = time.perf_counter()
+            self.timers[name] += now - self._last_lap
+            self._last_lap = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self._started
+        steps = self.counters.get('steps', 0)
+        return {
+            'elapsed': elapsed,
+            'steps_per_sec': steps / elapsed if elapsed > 0 else 0.0,
+            'crash_rate': self.counters.get('crashes', 0) / steps if steps else 0.0,
+            **{name: value for (name, value) in sorted(self.counters.items())},
+            **{f'{name}_sec': value for (name, value) in sorted(self.timers.items())}
+        }
+
+    def export(self, path: str) -> None:
+        '''
+        Append a snapshot to a JSON lines file (.json / .jsonl) or a CSV file.
+
+        :param path: the file to append to
+        '''
+        snapshot = self.snapshot()
+        if path.endswith('.json') or path.endswith('.jsonl'):
+            with open(path, 'a') as f:
+                f.write(json.dumps(snapshot) + '\n')
+        else:
+            new = not os.path.exists(path) or os.path.getsize(path) == 0
+            with open(path, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDS, restval=0, extrasaction='ignore')
+                if new:
+                    writer.writeheader()
+                writer.writerow(snapshot)
+
+    def tick(self) -> None:
+        '''
+        Export a snapshot to the configured output if the interval has passed.
+        '''
+        if self.enabled and self.output:
+            now = time.perf_counter()
+            if now - self._last_export >= self.interval:
+                self._last_export = now
+                self.export(self.output)
+
+
+profiler: Profiler = Profiler()
@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+
+from typing import Any, Dict, List, Optional
+
+from src.rng import RandomStream
+from src.track import Track
+from src.races.vec_race import VecRace
+
+EARLY_STOPPING: bool = os.environ.get('EARLY_STOPPING', 'false').lower() == 'true'
+EVAL_EVERY: int = int(os.environ.get('EVAL_EVERY', 100))
+PATIENCE: int = int(os.environ.get('PATIENCE', 5))
+TOLERANCE: float = float(os.environ.get('TOLERANCE', 0.01))
+POLICY_CHANGE: float = float(os.environ.get('POLICY_CHANGE', 0.01))
+ROLLOUTS: int = int(os.environ.get('ROLLOUTS', 64))
+
+
+def rollout_policy(track: Track, policy: np.ndarray, episodes: int, max_steps: int, rng: Optional[RandomStream] = None) -> np.ndarray:
+    '''
+    Run a fixed greedy policy for a batch of episodes at once.
+
+    :param track: the track
+    :param policy: the action column of every state index
+    :param episodes: the number of episodes to run
+    :param max_steps: the steps after which an episode is cut off
+    :param rng: the random stream to draw from
+    :return: the number of steps every episode took
+    '''
+    env = VecRace(track, episodes, max_steps=max_steps, rng=rng)
+    lengths = np.zeros(episodes, dtype=np.int64)
+    running = np.ones(episodes, dtype=bool)
+    while running.any():
+        _, _, dones, steps = env.step(policy[env.states])
+        ended = dones & running
+        lengths[ended] = steps[ended]
+        running &= ~dones
+    return lengths
+
+
+class ConvergenceMonitor:
+    '''
+    Periodically freezes a learner's greedy policy and measures its expected
+    steps to finish, exactly where every start finishes for sure and with a
+    batch of rollouts otherwise. A check has plateaued when it scores within
+    the tolerance of the best, changes at most policy_change of the greedy
+    actions and has no rollout cut off at max_steps, and training is
+    considered converged once patience checks in a row plateau. The Q values
+    behind the best score are kept and put back into the learner when it
+    converges, so stopping never leaves it with a worse policy.
+    '''
+
+    def __init__(
+        self,
+        every: int = EVAL_EVERY,
+        patience: int = PATIENCE,
+        tolerance: float = TOLERANCE,
+        policy_change: float = POLICY_CHANGE,
+        rollouts: int = ROLLOUTS,
+        rng: Optional[RandomStream] = None
+    ):
+        self.every: int = every
+        self.patience: int = patience
+        self.tolerance: float = tolerance
+        self.policy_change: float = policy_change
+        self.rollouts: int = rollouts
+        self.rng: RandomStream = rng if rng is not None else RandomStream()
+
+        self.history: List[Dict[str, Any]] = []
+        self.best: float = float('inf')
+        self.stale: int = 0
+        self.due: int = every
+        self.converged: bool = False
+        self.policy: Optional[np.ndarray] = None
+        self.best_values: Optional[np.ndarray] = None
+
+    def update(self, learner) -> bool:
+        '''
+        Check the learner if it is due for a check.
+
+        :param learner: a learner with greedy_policy and evaluate methods and a Q table
+        :return: whether training has converged
+        '''
+        if self.converged or learner.episode < self.due:
+            return self.converged
+        self.due = learner.episode + self.every
+
+        policy = learner.greedy_policy().copy()
+        steps, exact, cut_off = learner.evaluate().mean_steps, True, False
+        if not np.isfinite(steps):
+            lengths = rollout_policy(learner.track, policy, self.rollouts, learner.max_steps, self.rng)
+            steps, exact, cut_off = float(lengths.mean()), False, bool((lengths >= learner.max_steps).any())
+        changed = 1.0 if self.policy is None else float(np.mean(policy != self.policy))
+        self.policy = policy
+
+        # only a steady policy scoring near the best counts towards patience
+        if self.best_values is None or steps < self.best * (1 - self.tolerance):
+            self.best, self.stale = steps, 0
+            self.best_values = learner.Q.values.copy()
+        elif not cut_off and steps <= self.best * (1 + self.tolerance) and changed <= self.policy_change:
+            self.stale += 1
+        else:
+            self.stale = 0
+        self.converged = self.stale >= self.patience
+        self.history.append({'episode': learner.episode, 'steps': steps, 'exact': exact, 'cut_off': cut_off, 'policy_change': changed})
+        if self.converged:
+            self.restore_best(learner)
+        return self.converged
+
+    def restore_best(self, learner) -> None:
+        '''
+        Put the Q values behind the best check back into the learner's table.
+
+        :param learner: a learner with a Q table
+        '''
+        if self.best_values is not None:
+            learner.Q.values[...] = self.best_values
+
+    def getstate(self) -> Dict[str, Any]:
+        return {'history': self.history, 'best': self.best, 'stale': self.stale, 'due': self.due, 'converged': self.converged}
+
+    def setstate(self, state: Dict[str, Any], policy: Optional[np.ndarray] = None, best_values: Optional[np.ndarray] = None) -> None:
+        self.history, self.best, self.stale = state['history'], state['best'], state['stale']
+        self.due, self.converged = state['due'], state['converged']
+        self.policy = None if policy is None else np.array(policy)
+        self.best_values = None if best_values is None else np.array(best_values)
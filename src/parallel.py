@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple
+
+from src.track import Track
+from src.render import Renderer
+from src.races import QLearning, DynaQ, QLambda, SARSA, SARSALambda, ValueIteration
+
+WORKERS: int = int(os.environ.get('WORKERS', os.cpu_count() or 1))
+
+LEARNERS = {
+    'QLearning': QLearning,
+    'DynaQ': DynaQ,
+    'QLambda': QLambda,
+    'SARSA': SARSA,
+    'SARSALambda': SARSALambda,
+    'ValueIteration': ValueIteration
+}
+
+# tracks already loaded (and their transitions built) by this worker process
+_tracks: Dict[str, Track] = {}
+
+
+class Job(NamedTuple):
+    algorithm: str
+    trackfile: str
+    config: Dict[str, Any]
+    seed: int
+
+
+def grid(algorithms: Iterable[str], trackfiles: Iterable[str], configs: Iterable[Dict[str, Any]], seeds: Iterable[int]) -> List[Job]:
+    '''
+    Build one job for every combination of algorithm, track, configuration and seed.
+
+    :param algorithms: the learner names (keys of LEARNERS)
+    :param trackfiles: the track files
+    :param configs: the keyword arguments to construct each learner with
+    :param seeds: the random seeds
+    :return: the jobs
+    '''
+    return [Job(*combination) for combination in itertools.product(algorithms, trackfiles, configs, seeds)]
+
+
+def _load_track(trackfile: str) -> Track:
+    if trackfile not in _tracks:
+        _tracks[trackfile] = Track.from_file(trackfile)
+    return _tracks[trackfile]
+
+
+def run_job(job: Job) -> Dict[str, Any]:
+    '''
+    Train a single learner without rendering and gather what it learned.
+
+    :param job: the job to run
+    :return: the job's settings with its loss values, greedy policy, timings and memory
+    '''
+    start = time.perf_counter()
+    track = _load_track(job.trackfile)
+    load_sec = time.perf_counter() - start
+
+    config = dict({'checkpoint_every': 0, 'seed': job.seed}, **job.config)
+    learner = LEARNERS[job.algorithm](track, renderer=Renderer(), **config)
+
+    start = time.perf_counter()
+    learner.train()
+    train_sec = time.perf_counter() - start
+
+    return {
+        **job._asdict(),
+        'loss_values': list(getattr(learner, 'loss_values', [])),
+        'policy': learner.greedy_policy(),
+        'load_sec': load_sec,
+        'train_sec': train_sec,
+        'memory': learner.memory()
+    }
+
+
+def run_jobs(jobs: List[Job], workers: int = WORKERS) -> List[Dict[str, Any]]:
+    '''
+    Run jobs across a pool of worker processes.
+
+    :param jobs: the jobs to run
+    :param workers: the number of processes, 1 runs the jobs in this process
+    :return: the result of every job, in the order of the jobs
+    '''
+    if workers <= 1:
+        return [run_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(run_job, jobs))
+
+
+def _parse_value(value: str) -> Any:
+    # anything that isn't JSON, such as precision=float32, is taken as a string
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _parse_config(settings: List[str]) -> List[Dict[str, Any]]:
+    # every name=value[,value...] setting multiplies the configurations
+    options = []
+    for setting in settings:
+        name, values = setting.split('=', 1)
+        options.append([(name, _parse_value(value)) for value in values.split(',')])
+    return [dict(combination) for combination in itertools.product(*options)]
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Train learners in parallel across tracks, configurations and seeds.')
+    parser.add_argument('--algorithms', nargs='+', choices=sorted(LEARNERS), default=['QLearning'])
+    parser.add_argument('--tracks', nargs='+', required=True)
+    parser.add_argument('--set', nargs='*', default=[], metavar='NAME=VALUE[,VALUE...]', help='learner keyword arguments')
+    parser.add_argument('--seeds', nargs='+', type=int, default=[0])
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    jobs = grid(args.algorithms, args.tracks, _parse_config(args.set), args.seeds)
+    results = run_jobs(jobs, args.workers)
+
+    for result in results:
+        losses = result['loss_values'][-100:]
+        mean_loss = f'{np.mean(losses):.1f}' if losses else '-'
+        print(f'{result["algorithm"]} {result["trackfile"]} {result["config"]} seed={result["seed"]} '
+              f'train={result["train_sec"]:.2f}s loss={mean_loss} memory={sum(result["memory"].values()) / 2 ** 20:.1f}MiB')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump([dict(result, policy=result['policy'].tolist()) for result in results], f)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
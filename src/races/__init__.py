@@ -1,11 +1,19 @@
 from src.races.sarsa import SARSA
+from src.races.sarsa_lambda import SARSALambda
 from src.races.q_learning import QLearning
+from src.races.dyna_q import DynaQ
+from src.races.q_lambda import QLambda
 from src.races.random_walk import RandomWalk
 from src.races.value_iteration import ValueIteration
+from src.races.vec_race import VecRace
 
 __all__ = [
     'SARSA',
+    'SARSALambda',
     'QLearning',
+    'DynaQ',
+    'QLambda',
     'RandomWalk',
-    'ValueIteration'
+    'ValueIteration',
+    'VecRace'
 ]
@@ -1,20 +1,40 @@
 import os
-import time
 
-from typing import List, Tuple
+import numpy as np
+
+from typing import Any, Dict, Optional, Tuple, Union
 
 from src.car import Car
+from src.rng import RandomStream, Seed, SEED
 from src.track import Track
+from src.render import Renderer, make_renderer
+from src.instrument import profiler
+from src.trajectory import Trajectory
+from src.evaluate import PolicyEvaluation, evaluate_policy
+from src.checkpoint import save_checkpoint, load_checkpoint, CHECKPOINT_DIR, CHECKPOINT_EVERY
+from src.transitions import action_column, STAY
 
 HARSH: bool = os.environ.get('HARSH', 'false').lower() == 'true'
 
 
 class AbstractRace:
 
-    def __init__(self, trackfile: str):
-        self.track = Track.from_file(trackfile)
-        self.car = Car(*self.track.starting_point)
-        self.history: List[Tuple] = []
+    def __init__(
+        self,
+        trackfile: Union[str, Track],
+        renderer: Optional[Renderer] = None,
+        checkpoint_dir: str = CHECKPOINT_DIR,
+        checkpoint_every: int = CHECKPOINT_EVERY,
+        seed: Seed = SEED
+    ):
+        self.track = trackfile if isinstance(trackfile, Track) else Track.from_file(trackfile)
+        self.rng: RandomStream = RandomStream(seed)
+        self.car = Car(*self.track.random_start(self.rng), rng=self.rng)
+        self.history: Trajectory = Trajectory.from_env()
+        self.renderer: Renderer = renderer if renderer is not None else make_renderer(self.track)
+        self.checkpoint_dir: str = checkpoint_dir
+        self.checkpoint_every: int = checkpoint_every
+        self._unsaved: int = 0
 
     @property
     def loss(self) -> int:
@@ -23,30 +43,94 @@ class AbstractRace:
     def run(self) -> None:
         raise NotImplementedError
 
+    def greedy_policy(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def evaluate(self) -> PolicyEvaluation:
+        '''
+        Compute the exact expected steps to finish under the greedy policy.
+
+        :return: the evaluation
+        '''
+        return evaluate_policy(self.track, self.greedy_policy(), harsh=HARSH)
+
+    def checkpoint(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        raise NotImplementedError
+
+    def restore(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def memory(self) -> Dict[str, int]:
+        '''
+        Account for the bytes held in arrays by the track and by the learner,
+        where the learner's arrays are the ones it checkpoints.
+
+        :return: the bytes of every component
+        '''
+        track, transitions = self.track, self.track.transitions
+        report = {
+            'track': track.walls.nbytes + track.finish.nbytes + track.starts.nbytes + len(track._wall_cells) + len(track._finish_cells),
+            'state_index': transitions.index.nbytes,
+            'transitions': transitions.next_state.nbytes + transitions.flags.nbytes
+        }
+        try:
+            arrays, _ = self.checkpoint()
+        except NotImplementedError:
+            arrays = {}
+        report.update((name, int(np.asarray(array).nbytes)) for (name, array) in arrays.items())
+        return report
+
+    def save(self, path: str) -> None:
+        arrays, meta = self.checkpoint()
+        save_checkpoint(path, self.track.state_index, arrays, dict(meta, learner=type(self).__name__, rng=self.rng.getstate()))
+
+    def load(self, path: str) -> None:
+        arrays, meta = load_checkpoint(path, self.track.state_index)
+        if meta['learner'] != type(self).__name__:
+            raise ValueError(f'Checkpoint {path} belongs to {meta["learner"]}, not {type(self).__name__}')
+        self.restore(arrays, meta)
+        self.rng.setstate(meta['rng'])
+
+    def autosave(self, episodes: int = 1) -> None:
+        '''
+        Save to checkpoint_dir once every checkpoint_every episodes.
+
+        :param episodes: the number of episodes completed since the last call
+        '''
+        self._unsaved += episodes
+        if self.checkpoint_every and self._unsaved >= self.checkpoint_every:
+            self.save(self.checkpoint_dir)
+            self._unsaved = 0
+
     def move(self, a_x: int, a_y: int, nondeterministic: bool = True):
-        # perform the movement
+        # choose the column of the acceleration that actually gets applied
         x_o, y_o, v_xo, v_yo = self.car.to_tuple()
-        self.car.set_acceleration(a_x, a_y, nondeterministic=nondeterministic)
-        x_i, y_i, _, _ = self.car.to_tuple()
-        self.history.append(((x_o, y_o, v_xo, v_yo), (a_x, a_y), self.car.to_tuple()))
+        if not nondeterministic or self.car._can_change():
+            column = action_column(a_x, a_y)
+        else:
+            column = STAY
 
-        # validate the movement
-        if not self.track.is_valid(x_o, y_o, x_i, y_i):
-            if HARSH:
-                self.car.x, self.car.y = self.track.starting_point
-                self.car.zeroize()
-            else:
-                self.car.x, self.car.y = self.track.nearest_valid(x_o, y_o, x_i, y_i)
-                self.car.zeroize()
+        # look up the consequences of the movement
+        state = self.track.state_index.index(x_o, y_o, v_xo, v_yo)
+        next_state, crashed, finished = self.track.transitions.step(state, column)
+        if crashed and HARSH:
+            self.car.x, self.car.y = self.track.random_start(self.rng)
+            self.car.zeroize()
+            finished = self.track.transitions.reset_finish(x_o, y_o, self.car.x, self.car.y)
+        else:
+            self.car.x, self.car.y, self.car.v_x, self.car.v_y = self.track.state_index.state(next_state)
+        self.history.append(x_o, y_o, v_xo, v_yo, a_x, a_y, *self.car.to_tuple())
 
-            x_i, y_i, _, _ = self.car.to_tuple()
+        profiler.count('steps')
+        if crashed:
+            profiler.count('crashes')
+        if finished:
+            profiler.count('finishes')
 
         # return whether or not the car has reached the finish line
-        return self.track.reached_finish(x_o, y_o, x_i, y_i)
+        return finished
 
     def print_steps(self) -> None:
-        for i, (x, y, _, _) in enumerate(self.history):
-            self.track.print_track(x, y)
-            time.sleep(0.5)
-            if i < len(self.history) - 1:
-                os.system('clear')
+        for step in self.history.episode():
+            self.renderer.frame(int(step['next_x']), int(step['next_y']))
+
@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+
+from typing import Dict, Tuple
+
+from src.instrument import profiler
+from src.transitions import N_ACTIONS
+from src.races.q_learning import QLearning
+from src.races.episodic import reward
+
+PLANNING_STEPS: int = int(os.environ.get('PLANNING_STEPS', 10))
+PRIORITIZED: bool = os.environ.get('PRIORITIZED', 'false').lower() == 'true'
+MODEL_OUTCOMES: int = int(os.environ.get('MODEL_OUTCOMES', 4))
+
+
+class DynaQ(QLearning):
+    '''
+    Q-learning that also learns a model of the track from the transitions it
+    observes and replays simulated transitions from that model between real
+    steps, so every real step is reused many times.
+    '''
+
+    def __init__(self, *args, planning_steps: int = PLANNING_STEPS, prioritized: bool = PRIORITIZED, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.planning_steps: int = planning_steps
+        self.prioritized: bool = prioritized
+
+        # the distinct next states seen for every state-action pair and how often
+        n = len(self.track.state_index)
+        self.model_next: np.ndarray = np.full((n, N_ACTIONS, MODEL_OUTCOMES), -1, dtype=np.int32)
+        self.model_counts: np.ndarray = np.zeros((n, N_ACTIONS, MODEL_OUTCOMES), dtype=np.int32)
+
+        # the observed pairs (as state * N_ACTIONS + action) and their last TD error
+        self.observed: np.ndarray = np.empty(n * N_ACTIONS, dtype=np.int64)
+        self.num_observed: int = 0
+        self.priorities: np.ndarray = np.zeros(n * N_ACTIONS, dtype=np.float32)
+
+    def checkpoint(self) -> Tuple[Dict[str, np.ndarray], Dict]:
+        arrays, meta = super().checkpoint()
+        arrays.update(
+            model_next=self.model_next,
+            model_counts=self.model_counts,
+            observed=self.observed[:self.num_observed],
+            priorities=self.priorities
+        )
+        return arrays, meta
+
+    def restore(self, arrays: Dict[str, np.ndarray], meta: Dict) -> None:
+        super().restore(arrays, meta)
+        self.model_next, self.model_counts = np.array(arrays['model_next']), np.array(arrays['model_counts'])
+        self.num_observed = len(arrays['observed'])
+        self.observed[:self.num_observed] = arrays['observed']
+        self.priorities = np.array(arrays['priorities'])
+
+    def memory(self) -> Dict[str, int]:
+        report = super().memory()
+        report['observed'] = self.observed.nbytes
+        return report
+
+    def record(self, state: int, action: int, next_state: int, td_error: float) -> None:
+        '''
+        Add a real transition to the model.
+
+        :param state: the state index the action was taken in
+        :param action: the action column
+        :param next_state: the state index the car ended up in
+        :param td_error: the TD error of the real update
+        '''
+        counts, outcomes = self.model_counts[state, action], self.model_next[state, action]
+        if not counts.any():
+            self.observed[self.num_observed] = state * N_ACTIONS + action
+            self.num_observed += 1
+
+        seen = np.flatnonzero(outcomes == next_state)
+        if len(seen):
+            counts[seen[0]] += 1
+        else:
+            # make room by forgetting the rarest outcome
+            slot = int(counts.argmin())
+            outcomes[slot], counts[slot] = next_state, 1
+        self.priorities[state * N_ACTIONS + action] = abs(td_error)
+
+    def plan(self, q_values: np.ndarray) -> None:
+        '''
+        Back up planning_steps observed state-action pairs at once, each towards
+        an outcome drawn from the model in proportion to how often it was seen.
+        The pairs are drawn uniformly or, when prioritized, are the ones with
+        the largest TD errors.
+
+        :param q_values: the (states, actions) view of the Q table
+        '''
+        observed = self.observed[:self.num_observed]
+        if not len(observed) or not self.planning_steps:
+            return
+        if not self.prioritized:
+            pairs = observed[self.rng.generator.integers(len(observed), size=self.planning_steps)]
+        elif len(observed) > self.planning_steps:
+            pairs = observed[np.argpartition(self.priorities[observed], -self.planning_steps)[-self.planning_steps:]]
+        else:
+            pairs = observed
+        states, actions = np.divmod(pairs, N_ACTIONS)
+
+        # sample an outcome of every pair from its counts
+        cumulative = self.model_counts[states, actions].cumsum(axis=1)
+        draws = self.rng.generator.random(len(pairs)) * cumulative[:, -1]
+        slots = (cumulative <= draws[:, None]).sum(axis=1)
+        next_states = self.model_next[states, actions, slots]
+
+        td_errors = reward / self.Q.precision.scale + self.gamma * q_values[next_states].max(axis=1) - q_values[states, actions]
+        q_values[states, actions] = self.Q.precision.store(q_values[states, actions] + self.learning_rate * td_errors)
+        if self.prioritized:
+            self.priorities[pairs] = np.abs(td_errors) * (1 - self.learning_rate)
+        profiler.count('backups', len(pairs))
+
+    def train_batched(self, num_cars: int) -> None:
+        raise NotImplementedError('DynaQ plans after every real step of a single car, so it cannot train a batch of cars')
+
+    def begin_training(self) -> None:
+        super().begin_training()
+        self._q_values: np.ndarray = self.Q.values.reshape(len(self.Q.values), -1)
+
+    def begin_episode(self) -> None:
+        self._state: int = self.track.state_index.index(*self.car.to_tuple())
+
+    def train_step(self) -> bool:
+        '''
+        Take an epsilon-greedy step, learn from it and then plan from the model.
+
+        :return: whether or not the car has reached the finish line
+        '''
+        state, q_values = self._state, self._q_values
+
+        # get the next action
+        ai_x, ai_y = self.choose_action(self.Q.values[state], self.epsilon)
+        action = 3 * ai_x + ai_y
+        profiler.lap('select')
+
+        # update the car's position
+        finished = self.move(ai_x - 1, ai_y - 1)
+        next_state = self.track.state_index.index(*self.car.to_tuple())
+        profiler.lap('move')
+
+        # learn from the real step, then from the model
+        td_error = self._step_reward + self.gamma * q_values[next_state].max() - q_values[state, action]
+        q_values[state, action] = self.Q.precision.store(q_values[state, action] + self.learning_rate * td_error)
+        self.record(state, action, next_state, td_error)
+        self.plan(q_values)
+        profiler.lap('update')
+
+        self._state = next_state
+        return finished
@@ -0,0 +1,237 @@
+import os
+
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+from src.rng import RandomStream
+from src.tables import QTable, Precision, PRECISION, value_bound
+from src.monitor import ConvergenceMonitor, EARLY_STOPPING
+from src.instrument import profiler
+from src.races.abstract import AbstractRace
+from src.races.vec_race import VecRace
+
+GAMMA: float = float(os.environ.get('GAMMA', 0.95))
+DECAY: float = float(os.environ.get('DECAY', 0.001))
+MAX_STEPS: int = int(os.environ.get('MAX_STEPS', 10000))
+reward: int = -1
+
+
+class EpisodicRace(AbstractRace):
+    '''
+    A tabular learner trained one episode at a time from a random start
+    against a Q table, leaving subclasses to define what happens on every
+    step. It holds everything QLearning, SARSA and their extensions share:
+    the hyperparameters, the table and its checkpoints, epsilon-greedy
+    action selection, early stopping and the bookkeeping between episodes.
+    '''
+
+    def __init__(
+        self,
+        *args,
+        epsilon: float,
+        learning_rate: float,
+        training_iters: int,
+        gamma: float = GAMMA,
+        decay: float = DECAY,
+        max_steps: int = MAX_STEPS,
+        early_stopping: bool = EARLY_STOPPING,
+        precision: str = PRECISION,
+        q_scale: float = 1.0,
+        **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+
+        # hyperparameters, defaulting to the environment's configuration
+        self.gamma: float = gamma
+        self.learning_rate: float = learning_rate
+        self.decay: float = decay
+        self.max_steps: int = max_steps
+        self.training_iters: int = training_iters
+
+        # define Q table, stored at the configured precision and started from q_scale times uniform [0, 1) values
+        self.precision: Precision = Precision.named(precision, value_bound(gamma, max_steps))
+        self.Q = QTable.random(self.track.state_index, scale=q_scale, generator=self.rng.generator, precision=self.precision)
+
+        # collect loss results
+        self.loss_values: List[int] = []
+
+        # track training progress so that it can be checkpointed and resumed
+        self.epsilon: float = epsilon
+        self.episode: int = 0
+
+        # stop before training_iters once the greedy policy stops improving
+        self.monitor: Optional[ConvergenceMonitor] = None
+        if early_stopping:
+            self.monitor = ConvergenceMonitor(rng=RandomStream(self.rng.generator.bit_generator.seed_seq.spawn(1)[0]))
+
+    @property
+    def converged(self) -> bool:
+        return self.monitor is not None and self.monitor.converged
+
+    def checkpoint(self) -> Tuple[Dict[str, np.ndarray], Dict]:
+        arrays = {'Q': self.Q.values, 'loss_values': np.array(self.loss_values, dtype=np.int64)}
+        meta = {'epsilon': self.epsilon, 'episode': self.episode, 'q_scale': self.Q.precision.scale}
+        if self.monitor is not None:
+            meta['monitor'] = self.monitor.getstate()
+            if self.monitor.policy is not None:
+                arrays['monitor_policy'] = self.monitor.policy
+            if self.monitor.best_values is not None:
+                arrays['monitor_best_values'] = self.monitor.best_values
+        return arrays, meta
+
+    def restore(self, arrays: Dict[str, np.ndarray], meta: Dict) -> None:
+        self.Q = QTable(self.track.state_index, arrays['Q'], Precision(arrays['Q'].dtype.type, meta.get('q_scale', 1.0)))
+        self.loss_values = arrays['loss_values'].tolist()
+        self.epsilon, self.episode = meta['epsilon'], meta['episode']
+        if self.monitor is not None and 'monitor' in meta:
+            self.monitor.setstate(meta['monitor'], arrays.get('monitor_policy'), arrays.get('monitor_best_values'))
+
+    def greedy_policy(self) -> np.ndarray:
+        return self.Q.greedy()
+
+    def best_action(self, q_value):
+        return divmod(int(q_value.argmax()), 3)
+
+    def choose_action(self, q_value, epsilon):
+        if self.rng.random() < epsilon:
+            ai_x, ai_y = (self.rng.integer(3), self.rng.integer(3))
+        else:
+            ai_x, ai_y = self.best_action(q_value)
+
+        return ai_x, ai_y
+
+    def batched_targets(self, q_values: np.ndarray, next_states: np.ndarray, actions: np.ndarray) -> np.ndarray:
+        '''
+        Get the values a batch of updates bootstraps from.
+
+        :param q_values: the (states, actions) view of the Q table
+        :param next_states: the state index every car ended up in
+        :param actions: the action column every car took
+        :return: the value of every car's next state
+        '''
+        raise NotImplementedError
+
+    def train_batched(self, num_cars: int) -> None:
+        '''
+        Train up to training_iters episodes with a batch of cars stepped together,
+        selecting actions and updating the Q table for all of them at once
+        towards the values batched_targets bootstraps from.
+
+        :param num_cars: the number of cars to simulate at once
+        '''
+        env = VecRace(self.track, num_cars, max_steps=self.max_steps, rng=self.rng)
+        q_values = self.Q.values.reshape(len(self.Q.values), -1)
+
+        profiler.start()
+        while self.episode < self.training_iters and not self.converged:
+
+            # choose an epsilon-greedy action for every car
+            states = env.states
+            actions = q_values[states].argmax(axis=1)
+            explore = self.rng.generator.random(num_cars) < self.epsilon
+            actions[explore] = self.rng.generator.integers(q_values.shape[1], size=int(explore.sum()))
+            q_o = q_values[states, actions]
+            profiler.lap('select')
+
+            # update the cars' positions
+            next_states, rewards, dones, steps = env.step(actions)
+            profiler.lap('move')
+
+            # update the Q table for every car's state-action pair
+            q_i = self.batched_targets(q_values, next_states, actions)
+            q_values[states, actions] = self.Q.precision.store(q_o + self.learning_rate * (rewards / self.Q.precision.scale + (self.gamma * q_i) - q_o))
+
+            # credit the completed episodes, but no more than are left in the budget
+            completed = min(int(dones.sum()), self.training_iters - self.episode)
+            self.epsilon -= self.decay * completed
+            self.episode += completed
+            self.loss_values.extend(steps[dones][:completed].tolist())
+            self.autosave(completed)
+            profiler.count('episodes', completed)
+            profiler.lap('update')
+            profiler.tick()
+            if self.monitor is not None and dones.any():
+                self.monitor.update(self)
+
+    def begin_training(self) -> None:
+        '''
+        Prepare whatever the steps of one call to train share, such as views
+        of the learner's tables.
+        '''
+        self._step_reward: float = reward / self.Q.precision.scale
+
+    def begin_episode(self) -> None:
+        '''
+        Prepare for an episode once the car has been placed at a start.
+        '''
+
+    def train_step(self) -> bool:
+        '''
+        Take one step and learn from it.
+
+        :return: whether or not the car has reached the finish line
+        '''
+        raise NotImplementedError
+
+    def train(self, episodes: Optional[int] = None) -> None:
+        '''
+        Train episode by episode up to training_iters, picking up from wherever
+        the learner last left off.
+
+        :param episodes: pause after this many more episodes, if given
+        '''
+        end = self.training_iters if episodes is None else min(self.training_iters, self.episode + episodes)
+        self.begin_training()
+
+        # Train through the specified number of training iterations
+        while self.episode < end and not self.converged:
+            self.renderer.progress(self.episode, self.training_iters)
+
+            # set the location and velocity of the car
+            self.car.x, self.car.y = self.track.random_start(self.rng)
+            self.car.zeroize()
+            self.begin_episode()
+
+            # train the car to find the finish
+            profiler.start()
+            finished, num_steps = False, 0
+            while not finished and num_steps < self.max_steps:
+                finished = self.train_step()
+                num_steps += 1
+
+            # Gradually reduce epsilon through the process
+            self.epsilon -= self.decay
+
+            # add loss for iteration to memory
+            self.loss_values.append(self.loss)
+            self.history.clear()
+
+            self.episode += 1
+            self.autosave()
+            profiler.count('episodes')
+            profiler.tick()
+            if self.monitor is not None:
+                self.monitor.update(self)
+
+        self.renderer.progress(self.episode, self.training_iters)
+
+    def race(self) -> None:
+        self.renderer.message('Racing...')
+        self.car.x, self.car.y = self.track.random_start(self.rng)
+        self.car.zeroize()
+
+        while True:
+            # apply the policy to the car
+            qval = self.Q[self.car.to_tuple()]
+            ai_x, ai_y = self.choose_action(qval, 0.1)
+            finished = self.move(ai_x - 1, ai_y - 1)
+            self.renderer.frame(self.car.x, self.car.y)
+
+            # check to see if the car has reached the finish
+            if finished:
+                break
+
+    def run(self) -> None:
+        self.train()
+        self.race()
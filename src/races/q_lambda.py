@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+
+from typing import Tuple
+
+from src.traces import EligibilityTraces, TRACE_THRESHOLD
+from src.instrument import profiler
+from src.transitions import N_ACTIONS
+from src.races.q_learning import QLearning
+
+LAMBDA: float = float(os.environ.get('LAMBDA', 0.9))
+
+
+class QLambda(QLearning):
+    '''
+    Watkins's Q(lambda): Q-learning with eligibility traces that are cut
+    whenever an exploratory action is taken, since the greedy return no
+    longer follows from the pairs visited before it.
+    '''
+
+    def __init__(self, *args, lam: float = LAMBDA, trace_threshold: float = TRACE_THRESHOLD, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lam: float = lam
+        self.traces: EligibilityTraces = EligibilityTraces(trace_threshold)
+
+    def train_batched(self, num_cars: int) -> None:
+        raise NotImplementedError(f'{type(self).__name__} follows its eligibility traces along the episode of a single car, so it cannot train a batch of cars')
+
+    def begin_training(self) -> None:
+        super().begin_training()
+        self._q_values: np.ndarray = self.Q.values.reshape(len(self.Q.values), -1)
+        self._q_flat: np.ndarray = self.Q.values.reshape(-1)
+
+    def begin_episode(self) -> None:
+        self.traces.clear()
+        self._state: int = self.track.state_index.index(*self.car.to_tuple())
+        self._action: Tuple[int, int] = self.choose_action(self.Q.values[self._state], self.epsilon)
+
+    def train_step(self) -> bool:
+        '''
+        Take the action chosen on the previous step, choose the next one and
+        apply the TD error to every pair in proportion to its trace.
+
+        :return: whether or not the car has reached the finish line
+        '''
+        state, (ai_x, ai_y) = self._state, self._action
+        q_values, q_flat = self._q_values, self._q_flat
+        action = 3 * ai_x + ai_y
+
+        # update the car's position
+        finished = self.move(ai_x - 1, ai_y - 1)
+        next_state = self.track.state_index.index(*self.car.to_tuple())
+        profiler.lap('move')
+
+        # choose the next action ahead of the update to know whether it explores
+        ai_x, ai_y = self.choose_action(self.Q.values[next_state], self.epsilon)
+        q_best = q_values[next_state].max()
+        greedy = q_values[next_state, 3 * ai_x + ai_y] == q_best
+        profiler.lap('select')
+
+        # apply the TD error to every pair in proportion to its trace
+        td_error = self._step_reward + (0.0 if finished else self.gamma * q_best) - q_values[state, action]
+        self.traces.visit(state * N_ACTIONS + action)
+        pairs, traces = self.traces.active()
+        q_flat[pairs] = self.Q.precision.store(q_flat[pairs] + self.learning_rate * td_error * traces)
+        if greedy:
+            self.traces.decay(self.gamma * self.lam)
+        else:
+            self.traces.clear()
+        profiler.lap('update')
+
+        self._state, self._action = next_state, (ai_x, ai_y)
+        return finished
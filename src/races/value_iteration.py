@@ -1,123 +1,341 @@
+from __future__ import annotations
+
 import os
 import time
-import copy
-import random
 import itertools
 
 import numpy as np
 
-from src.races.abstract import AbstractRace
+from typing import Dict, Optional, Tuple
+
+from src.track import Track
+from src.render import Renderer
+from src.tables import Precision, PRECISION, value_bound
+from src.evaluate import P_ACCEL, P_NO_ACCEL
+from src.transitions import action_column, CRASHED, FINISHED, STAY
+from src.instrument import profiler
+from src.races.abstract import AbstractRace, HARSH
 
 GAMMA: float = float(os.environ.get('GAMMA', 0.95))
 LEARNING_RATE: float = float(os.environ.get('LEARNING_RATE', 0.1))
-TRAINING_ITERS: int = int(os.environ.get('TRAINING_ITERS', 30))
+TRAINING_ITERS: int = int(os.environ.get('TRAINING_ITERS', 1000))
 THETA: float = float(os.environ.get('THETA', 0.1))
+SOLVER: str = os.environ.get('SOLVER', 'sync').lower()
+PRIORITY_BATCH: int = int(os.environ.get('PRIORITY_BATCH', 256))
+PRIORITY_FRACTION: float = float(os.environ.get('PRIORITY_FRACTION', 0.1))
+MULTIGRID: int = int(os.environ.get('MULTIGRID', 0))
+COARSEN: int = int(os.environ.get('COARSEN', 2))
+# tracks are not coarsened below this many cells on a side, since the small
+# ones converge in fewer sweeps than building and solving a coarse copy costs
+MIN_COARSE_SIZE: int = 32
 
 
 class ValueIteration(AbstractRace):
 
-    def __init__(self, *args, **kwargs):
+    def __init__(
+        self,
+        *args,
+        gamma: float = GAMMA,
+        training_iters: int = TRAINING_ITERS,
+        theta: float = THETA,
+        solver: str = SOLVER,
+        priority_batch: int = PRIORITY_BATCH,
+        priority_fraction: float = PRIORITY_FRACTION,
+        precision: str = PRECISION,
+        multigrid: int = MULTIGRID,
+        coarsen: int = COARSEN,
+        **kwargs
+    ):
         super().__init__(*args, **kwargs)
 
+        # hyperparameters, defaulting to the environment's configuration
+        self.gamma: float = gamma
+        self.training_iters: int = training_iters
+        self.theta: float = theta
+        self.solver: str = solver.lower()
+        self.priority_batch: int = priority_batch
+        self.priority_fraction: float = priority_fraction
+        self.precision: Precision = Precision.named(precision, value_bound(gamma, training_iters))
+        self.multigrid: int = multigrid
+        self.coarsen: int = coarsen
+
         # set the default values for the algo
         self.actions = list(itertools.permutations([-1, 0, 1], 2))
-        self.states: dict = {}
-        self.Q: dict = {}
-        self.policy: dict = {}
-
-        # iterate over the potential states
-        for x in range(self.track._x_max):
-            for y in range(self.track._y_max):
-                for v_x in range(-5, 6):
-                    for v_y in range(-5, 6):
-                        # define the initial state values
-                        self.states[(x, y, v_x, v_y)] = random.random()
-                        # define the initial Q values
-                        if (x, y) in self.track._finishing_points:
-                            self.Q[(x, y, v_x, v_y)] = [0 for _ in self.actions]
-                        else:
-                            self.Q[(x, y, v_x, v_y)] = [random.random() for _ in self.actions]
+        self.columns = np.array([action_column(*action) for action in self.actions])
+        self.index = self.track.state_index
 
-    def run(self) -> None:
-        # create a boolean variable for convergence
+        # define the initial state values, Q values and policy, indexed by state and stored at the configured precision
+        self.states: np.ndarray = self.precision.encode(self.rng.generator.random(len(self.index)))
+        self.Q: np.ndarray = self.precision.encode(self.rng.generator.random((len(self.index), len(self.actions))))
+        self.policy: np.ndarray = np.zeros(len(self.index), dtype=np.int8)
+
+        # gather the successor of every state under every action once
+        transitions = self.track.transitions
+        self.successors: np.ndarray = transitions.next_state[:, self.columns]
+        self.rewards: np.ndarray = np.where(transitions.flags[:, self.columns] & FINISHED, 0, -1).astype(np.int8)
+        self.stay_rewards: np.ndarray = np.where(transitions.flags[:, STAY] & FINISHED, 0, -1).astype(np.int8)
+        self.crashed: np.ndarray = (transitions.flags[:, self.columns] & CRASHED) != 0
+        self.starts: np.ndarray = np.array([self.index.index(x, y, 0, 0) for (x, y) in self.track._starting_points])
+        self.backups: int = 0
+        self.solve_sec: float = 0.0
+
+    def backup(self, values: np.ndarray, states: Optional[np.ndarray] = None) -> np.ndarray:
+        '''
+        Compute the Q value of state-action pairs from the given state values,
+        where the acceleration applies with probability 0.8 and the car
+        otherwise stays where it is, earning the reward of staying put and
+        keeping its current value.
+
+        :param values: the current state values, as stored
+        :param states: the states to back up, defaults to all of them
+        :return: the (states, actions) Q values as float64
+        '''
+        if states is None:
+            states = slice(None)
+        successor_values = self.precision.decode(values[self.successors[states]])
+        if HARSH:
+            # crashing sends the car to a random starting point
+            successor_values[self.crashed[states]] = self.precision.decode(values[self.starts]).mean()
+        moved = self.rewards[states] + self.gamma * successor_values
+        stayed = self.stay_rewards[states] + self.gamma * self.precision.decode(values[states])
+        return P_ACCEL * moved + P_NO_ACCEL * stayed[:, None]
+
+    def settle(self, states: np.ndarray) -> np.ndarray:
+        '''
+        Solve the Bellman equation of each given state for its own value while
+        holding its successors' values fixed. A failed acceleration leaves the
+        car where it is, so a state's backup reads its own value, and backing
+        it up once only moves that value part of the way.
+
+        :param states: the states to settle
+        :return: the value of every given state as float64
+        '''
+        successor_values = self.precision.decode(self.states[self.successors[states]])
+        if HARSH:
+            successor_values[self.crashed[states]] = self.precision.decode(self.states[self.starts]).mean()
+        moved = (self.rewards[states] + self.gamma * successor_values).max(axis=1)
+        return (P_ACCEL * moved + P_NO_ACCEL * self.stay_rewards[states]) / (1 - P_NO_ACCEL * self.gamma)
+
+    @property
+    def tolerance(self) -> float:
+        '''
+        The Bellman residual the solvers stop at. A residual of r leaves every
+        value within r * gamma / (1 - gamma) of its optimum, so theta is scaled
+        to bound that error rather than the residual itself, although never
+        below the gap between stored values that rounding leaves residuals at.
+        '''
+        tolerance = self.theta * (1 - self.gamma) / self.gamma if self.gamma < 1 else self.theta
+        return max(tolerance, self.precision.resolution(value_bound(self.gamma, self.training_iters)))
+
+    def predecessors(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Build the reverse of the successor arrays in CSR form, so that the
+        states whose backups read state s are preds[offsets[s]:offsets[s + 1]]
+        (a state may be listed more than once).
+
+        :return: the offsets and the predecessor states
+        '''
+        n = len(self.index)
+        sources = np.repeat(np.arange(n), len(self.actions))
+        targets = self.successors.ravel()
+        if HARSH:
+            # a crash reads the value of every starting point
+            crashers = np.flatnonzero(self.crashed.any(axis=1))
+            sources = np.concatenate([sources, np.repeat(crashers, len(self.starts))])
+            targets = np.concatenate([targets, np.tile(self.starts, len(crashers))])
+
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=n), out=offsets[1:])
+        return offsets, sources[np.argsort(targets, kind='stable')]
+
+    def sweep(self) -> int:
+        '''
+        Run synchronous sweeps over every state until the largest change in
+        value falls below the tolerance.
+
+        :return: the number of single-state backups performed
+        '''
+        profiler.start()
         num_iters, max_q_delta = 0, float('inf')
+        q_values = self.precision.decode(self.Q)
+        while max_q_delta > self.tolerance and num_iters < self.training_iters:
 
-        # loop until convergence is achieved
-        while max_q_delta > THETA and num_iters < TRAINING_ITERS:
+            # sweep every state at once using the best action value
+            q_values = self.backup(self.states)
+            new_states = q_values.max(axis=1)
+            max_q_delta = float(np.abs(new_states - self.precision.decode(self.states)).max())
+            self.states = self.precision.encode(new_states)
 
-            # create a copy of the previous q-values table
-            states_cpy = copy.deepcopy(self.states)
+            num_iters += 1
+            profiler.count('backups', len(self.index))
+            profiler.lap('sweep')
+            profiler.tick()
 
-            # define the initial q-delta value to be zero
-            max_q_delta: float = float('-inf')
+        self.Q = self.precision.encode(q_values)
+        return num_iters * len(self.index)
 
-            # iterate over the possible states
-            for x in range(self.track._x_max):
-                for y in range(self.track._y_max):
-                    for v_x in range(-5, 6):
-                        for v_y in range(-5, 6):
+    def prioritized_sweep(self) -> int:
+        '''
+        Settle the states with the largest bounds on their Bellman residuals
+        until no bound exceeds the tolerance. The bounds start at the exact
+        residuals; settling a state clears its bound, and a change of delta
+        in a value moves the backups that read it by at most gamma * delta,
+        so that is added to the bounds of its predecessors rather than
+        backing them up again to find out. Every round settles the larger of
+        priority_batch and priority_fraction of the states above the tolerance.
+        Started from the lowest value, only the states that can finish have
+        residuals at first, and the priorities spread back from the finish.
 
-                            # skip invalid locations
-                            if self.track._track[x][y] is False:
-                                self.Q[(x, y, v_x, v_y)] = float('-inf')
-                                continue
+        :return: the number of single-state backups performed
+        '''
+        offsets, preds = self.predecessors()
+        limit = self.training_iters * len(self.index)
+        tolerance = self.tolerance
 
-                            # define a variable to get the q-value of the best action
-                            max_q: float = float('-inf')
+        profiler.start()
+        bounds = np.abs(self.backup(self.states).max(axis=1) - self.precision.decode(self.states))
+        growth = np.zeros(len(self.index))
+        touched = np.zeros(len(self.index), dtype=bool)
+        active = np.flatnonzero(bounds > tolerance)
+        backups = 0
+        while len(active) and backups < limit:
 
-                            # place holder for best policy action
-                            best_policy = (0, 0)
+            # settle the states with the largest bounds
+            batch = max(self.priority_batch, int(len(active) * self.priority_fraction))
+            top = active if len(active) <= batch else active[np.argpartition(bounds[active], -batch)[-batch:]]
+            previous = self.precision.decode(self.states[top])
+            self.states[top] = self.precision.encode(self.settle(top))
+            changes = self.gamma * np.abs(self.precision.decode(self.states[top]) - previous)
+            backups += len(top)
 
-                            # iterate over the set of possible actions and assign
-                            # an updated value for each options
-                            for j in range(len(self.actions)):
+            # grow the bounds of the states that read them
+            starts, ends = offsets[top], offsets[top + 1]
+            lengths = ends - starts
+            positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+            np.maximum.at(growth, preds[positions], np.repeat(changes, lengths))
+            bounds[top] = 0.0
+            touched[preds[positions]] = True
+            touched[top] = True
+            dependents = np.flatnonzero(touched)
+            bounds[dependents] += growth[dependents]
+            growth[dependents], touched[dependents] = 0.0, False
 
-                                # set the new x, y, v_x, and v_y
-                                self.car.x, self.car.y = x, y
-                                self.car.v_x, self.car.v_y = v_x, v_y
+            active = np.flatnonzero(bounds > tolerance)
+            profiler.count('backups', len(top))
+            profiler.lap('sweep')
+            profiler.tick()
 
-                                # run the current action
-                                finished = self.move(*self.actions[j], nondeterministic=False)
+        self.Q = self.precision.encode(self.backup(self.states))
+        return backups
 
-                                # compute the error based on successful movement and failed movement
-                                exp: float = 0.8 * self.states[self.car.to_tuple()] + 0.2 * states_cpy[(x, y, v_x, v_y)]  # noqa
+    def checkpoint(self) -> Tuple[Dict[str, np.ndarray], Dict]:
+        return {'states': self.states, 'Q': self.Q, 'policy': self.policy}, {'backups': self.backups, 'solve_sec': self.solve_sec, 'scale': self.precision.scale}
 
-                                # get the reward and state values
-                                reward: int = 0 if finished else -1
+    def restore(self, arrays: Dict[str, np.ndarray], meta: Dict) -> None:
+        self.states, self.Q, self.policy = arrays['states'], arrays['Q'], arrays['policy']
+        self.precision = Precision(self.states.dtype.type, meta.get('scale', 1.0))
+        self.backups = meta['backups']
+        self.solve_sec = meta.get('solve_sec', 0.0)
 
-                                # update the Q values
-                                new_q_value: float = reward + (GAMMA * exp)
-                                self.Q[(x, y, v_x, v_y)][j] = new_q_value
+    def memory(self) -> Dict[str, int]:
+        report = super().memory()
+        report.update(successors=self.successors.nbytes, rewards=self.rewards.nbytes + self.stay_rewards.nbytes, crashed=self.crashed.nbytes)
+        return report
 
-                                # check if new_q is greater than max_q
-                                if new_q_value > max_q:
-                                    max_q = new_q_value
-                                    best_policy = self.actions[j]
+    def greedy_policy(self) -> np.ndarray:
+        return self.policy
 
-                            # reassign the values using the best action value max_q
-                            old_q = self.states[(x, y, v_x, v_y)]
-                            self.states[(x, y, v_x, v_y)] = max_q
-                            self.policy[(x, y, v_x, v_y)] = best_policy
+    def warm_start(self) -> int:
+        '''
+        Solve a copy of the track coarsened by the coarsen factor, itself warm
+        started from a coarser copy while multigrid levels remain, and prolong
+        its values onto this track's states as their starting values.
 
-                            # check if the q_delta has been exceeded
-                            q_delta: float = old_q - max_q
-                            if q_delta > max_q_delta:
-                                max_q_delta = q_delta
+        :return: the number of single-state backups spent on the coarse tracks
+        '''
+        track: Track = self.track
+        if min(track._x_max, track._y_max) // self.coarsen < MIN_COARSE_SIZE:
+            return 0
+        coarse = ValueIteration(
+            track.coarsen(self.coarsen),
+            renderer=Renderer(),
+            checkpoint_every=0,
+            seed=self.rng.generator.bit_generator.seed_seq.spawn(1)[0],
+            gamma=self.gamma,
+            training_iters=self.training_iters,
+            theta=self.theta,
+            solver=self.solver,
+            priority_batch=self.priority_batch,
+            priority_fraction=self.priority_fraction,
+            precision=self.precision.name,
+            multigrid=self.multigrid - 1,
+            coarsen=self.coarsen
+        )
+        coarse.train()
+        self.states = self.precision.encode(self.prolong(coarse))
+        return coarse.backups
 
-            num_iters += 1
+    def prolong(self, coarse: ValueIteration) -> np.ndarray:
+        '''
+        Map the values of a coarse solution onto this track's states. Every
+        state reads the coarse state over its cell with its velocity scaled
+        down, or the coarse cell at rest when that state was never reached,
+        or the worst coarse value when neither was. A coarse step covers
+        coarsen times the ground, so the steps to go behind every value are
+        stretched by that factor.
+
+        :param coarse: the solved coarse learner
+        :return: the starting value of every state
+        '''
+        factor = self.coarsen
+        states = self.index.states.astype(np.int64)
+        cells = states[:, :2] // factor
+        found = coarse.index.lookup(np.concatenate([cells, np.rint(states[:, 2:] / factor).astype(np.int64)], axis=1))
+        at_rest = coarse.index.lookup(np.concatenate([cells, np.zeros_like(cells)], axis=1))
+        found = np.where(found >= 0, found, at_rest)
+
+        coarse_values = coarse.precision.decode(coarse.states)
+        values = np.where(found >= 0, coarse_values[found], coarse_values.min())
+        if self.gamma >= 1:
+            return values * factor
+        # gamma ** steps = 1 + (1 - gamma) * value, so raising it to the factor stretches the steps
+        return -(1 - np.clip(1 + (1 - self.gamma) * values, 0, 1) ** factor) / (1 - self.gamma)
+
+    def train(self) -> None:
+        start = time.perf_counter()
+        if self.solver == 'prioritized':
+            # start every value from below so that only the states that can finish have residuals
+            self.states = self.precision.encode(np.full(len(self.index), -value_bound(self.gamma, self.training_iters)))
 
+        # start from a solution of a coarser copy of the track when asked to
+        coarse_backups = self.warm_start() if self.multigrid > 0 else 0
+
+        # loop until convergence is achieved
+        if self.solver == 'prioritized':
+            self.backups = self.prioritized_sweep()
+        else:
+            self.backups = self.sweep()
+        self.backups += coarse_backups
+        self.solve_sec = time.perf_counter() - start
+
+        self.policy = self.columns[self.Q.argmax(axis=1)].astype(np.int8)
+
+    def race(self) -> None:
         # set the car to the starting point
-        self.history = []
-        self.car.x, self.car.y = self.track.starting_point
+        self.history.clear()
+        self.car.x, self.car.y = self.track.random_start(self.rng)
+        self.car.zeroize()
 
         while True:
             # apply the policy to the car
-            action = self.policy[self.car.to_tuple()]
-            finished = self.move(*action)
-            self.track.print_track(self.car.x, self.car.y)
-            time.sleep(0.5)
-            os.system('clear')
+            a_x, a_y = divmod(int(self.policy[self.index.index(*self.car.to_tuple())]), 3)
+            finished = self.move(a_x - 1, a_y - 1)
+            self.renderer.frame(self.car.x, self.car.y)
 
             # check to see if the car has reached the finish
             if finished:
                 break
+
+    def run(self) -> None:
+        self.train()
+        self.race()
@@ -0,0 +1,92 @@
+import numpy as np
+
+from typing import Optional, Tuple
+
+from src.rng import RandomStream
+from src.track import Track
+from src.transitions import CRASHED, FINISHED, STAY
+from src.instrument import profiler
+from src.races.abstract import HARSH
+
+
+class VecRace:
+    '''
+    Steps a batch of cars on the same track at once. Each car is held as the
+    index of its (x, y, v_x, v_y) state so that a whole step is a handful of
+    array reads from the track's transition table.
+    '''
+
+    def __init__(self, track: Track, num_cars: int, max_steps: Optional[int] = None, rng: Optional[RandomStream] = None):
+        self.track: Track = track
+        self.rng: RandomStream = rng if rng is not None else RandomStream()
+        self.num_cars: int = num_cars
+        self.max_steps: Optional[int] = max_steps
+
+        # the zero velocity state of every starting point
+        index = track.state_index
+        self._starts: np.ndarray = np.array([index.index(x, y, 0, 0) for (x, y) in track._starting_points])
+
+        self.states: np.ndarray = np.empty(num_cars, dtype=np.int64)
+        self.steps: np.ndarray = np.zeros(num_cars, dtype=np.int64)
+        self.reset()
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self.track.state_index.states[self.states, :2]
+
+    @property
+    def velocities(self) -> np.ndarray:
+        return self.track.state_index.states[self.states, 2:]
+
+    def reset(self, cars: Optional[np.ndarray] = None) -> None:
+        '''
+        Place cars on random starting points with zero velocity.
+
+        :param cars: boolean mask of the cars to reset, defaults to all of them
+        '''
+        if cars is None:
+            cars = np.ones(self.num_cars, dtype=bool)
+        self.states[cars] = self._starts[self.rng.generator.integers(len(self._starts), size=int(cars.sum()))]
+        self.steps[cars] = 0
+
+    def step(self, actions: np.ndarray, nondeterministic: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        '''
+        Apply one action per car and reset the cars that finished.
+
+        :param actions: the action column (3 * (a_x + 1) + (a_y + 1)) of every car
+        :param nondeterministic: whether accelerations only apply 80% of the time
+        :return: the next states (before any reset), the rewards, whether each
+                 car's episode ended and the number of steps each car has taken
+                 in its episode
+        '''
+        columns = np.asarray(actions)
+        if nondeterministic:
+            columns = np.where(self.rng.generator.random(self.num_cars) < 0.8, columns, STAY)
+
+        next_states = self.track.transitions.next_state[self.states, columns].astype(np.int64)
+        flags = self.track.transitions.flags[self.states, columns]
+        finished = (flags & FINISHED) != 0
+
+        # send crashed cars back to the start rather than the nearest valid point
+        if HARSH:
+            index, transitions = self.track.state_index, self.track.transitions
+            for car in np.flatnonzero(flags & CRASHED):
+                x_o, y_o, _, _ = index.state(self.states[car])
+                x, y = self.track.random_start(self.rng)
+                next_states[car] = index.index(x, y, 0, 0)
+                finished[car] = transitions.reset_finish(x_o, y_o, x, y)
+
+        if profiler.enabled:
+            profiler.count('steps', self.num_cars)
+            profiler.count('crashes', int(np.count_nonzero(flags & CRASHED)))
+            profiler.count('finishes', int(np.count_nonzero(finished)))
+
+        self.states = next_states.copy()
+        self.steps += 1
+        steps = self.steps.copy()
+
+        # end the episodes of the cars that finished or ran out of steps
+        dones = finished if self.max_steps is None else finished | (self.steps >= self.max_steps)
+        self.reset(dones)
+
+        return next_states, np.full(self.num_cars, -1.0), dones, steps
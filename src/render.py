@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+from typing import Optional, TextIO, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.track import Track
+
+RENDER: str = os.environ.get('RENDER', 'terminal').lower()
+FPS: float = float(os.environ.get('FPS', 2))
+PROGRESS_INTERVAL: float = float(os.environ.get('PROGRESS_INTERVAL', 0.5))
+
+CLEAR: str = '\x1b[2J\x1b[H'
+
+
+def _goto(row: int, col: int) -> str:
+    return f'\x1b[{row + 1};{col + 1}H'
+
+
+class FrameLimiter:
+    '''
+    Sleeps just long enough between ticks to hold a maximum frame rate.
+    '''
+
+    def __init__(self, fps: float):
+        self._interval: float = 1 / fps if fps > 0 else 0.0
+        self._last: float = float('-inf')
+
+    def wait(self) -> None:
+        remaining = self._last + self._interval - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        self._last = time.monotonic()
+
+
+class Renderer:
+    '''
+    Headless renderer that discards everything, used for production runs.
+    '''
+
+    def frame(self, x: int, y: int) -> None:
+        pass
+
+    def progress(self, done: int, total: int) -> None:
+        pass
+
+    def message(self, text: str) -> None:
+        pass
+
+
+class TerminalRenderer(Renderer):
+    '''
+    Draws the track once with ANSI escapes and then only repaints the cell the
+    car left and the cell it moved to.
+    '''
+
+    def __init__(
+        self,
+        track: Track,
+        fps: float = FPS,
+        progress_interval: float = PROGRESS_INTERVAL,
+        stream: TextIO = sys.stdout
+    ):
+        self._rows = track.frame
+        self._limiter: FrameLimiter = FrameLimiter(fps)
+        self._progress_interval: float = progress_interval
+        self._last_progress: float = float('-inf')
+        self._stream: TextIO = stream
+        self._car: Optional[Tuple[int, int]] = None
+
+    def frame(self, x: int, y: int) -> None:
+        self._limiter.wait()
+        if self._car is None:
+            # draw the whole track the first time around
+            rows = list(self._rows)
+            rows[x] = rows[x][:y] + 'X' + rows[x][y + 1:]
+            output = CLEAR + '\n'.join(rows)
+        else:
+            x_o, y_o = self._car
+            output = _goto(x_o, y_o) + self._rows[x_o][y_o] + _goto(x, y) + 'X'
+
+        # park the cursor underneath the track
+        self._stream.write(output + _goto(len(self._rows), 0))
+        self._stream.flush()
+        self._car = (x, y)
+
+    def progress(self, done: int, total: int) -> None:
+        now = time.monotonic()
+        if now - self._last_progress < self._progress_interval and done < total:
+            return
+        self._last_progress = now
+        self._stream.write(f'\rTraining Completed: {round(100 * done / total, 1)}%')
+        self._stream.flush()
+
+    def message(self, text: str) -> None:
+        self._stream.write('\n' + text + '\n')
+        self._stream.flush()
+        self._car = None
+
+
+def make_renderer(track: Track, mode: str = RENDER) -> Renderer:
+    '''
+    Create the renderer for the requested mode.
+
+    :param track: the track that will be drawn
+    :param mode: either 'terminal' or 'none'
+    :return: the renderer
+    '''
+    if mode == 'terminal':
+        return TerminalRenderer(track)
+    elif mode == 'none':
+        return Renderer()
+    else:
+        raise ValueError(f'Unrecognized renderer: {mode}')
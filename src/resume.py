@@ -0,0 +1,28 @@
+import argparse
+
+import src
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Resume a learner from a checkpoint.')
+    parser.add_argument('algorithm', choices=['QLearning', 'DynaQ', 'QLambda', 'SARSA', 'SARSALambda', 'ValueIteration'])
+    parser.add_argument('trackfile')
+    parser.add_argument('checkpoint')
+    parser.add_argument('--race-only', action='store_true', help='skip any remaining training')
+    parser.add_argument('--evaluate', action='store_true', help='report the expected steps to finish instead of racing')
+    parser.add_argument('--memory', action='store_true', help='report the bytes held by the learner and its track')
+    args = parser.parse_args()
+
+    learner = getattr(src, args.algorithm)(args.trackfile)
+    learner.load(args.checkpoint)
+    if not args.race_only:
+        learner.train()
+    if args.memory:
+        report = learner.memory()
+        for (name, size) in sorted(report.items(), key=lambda item: -item[1]):
+            print(f'{name:>16} {size:>14,}')
+        print(f'{"total":>16} {sum(report.values()):>14,}')
+    if args.evaluate:
+        print(learner.evaluate().summary())
+    else:
+        learner.race()
@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+
+from typing import Any, Dict, Optional, Union
+
+SEED: Optional[int] = int(os.environ['SEED']) if os.environ.get('SEED') else None
+BLOCK_SIZE: int = int(os.environ.get('RNG_BLOCK_SIZE', 4096))
+
+Seed = Union[None, int, np.random.SeedSequence]
+
+
+class RandomStream:
+    '''
+    A seedable random stream for one environment. Scalar draws are handed out
+    from a block of uniforms drawn from a numpy Generator in bulk, so the
+    per-step cost is a list read instead of a call into a global generator.
+    Array draws go straight to the generator.
+    '''
+
+    def __init__(self, seed: Seed = SEED, block_size: int = BLOCK_SIZE):
+        self.block_size: int = block_size
+        self.seed(seed)
+
+    def seed(self, seed: Seed) -> None:
+        '''
+        Restart the stream in place, so everything sharing it follows along.
+
+        :param seed: an int, a SeedSequence or None for fresh entropy
+        '''
+        self.generator: np.random.Generator = np.random.default_rng(seed)
+        self._refill()
+
+    def _refill(self) -> None:
+        # remember where the block started so the stream can be checkpointed
+        self._block_state: Dict[str, Any] = self.generator.bit_generator.state
+        self._block = self.generator.random(self.block_size).tolist()
+        self._position: int = 0
+
+    def random(self) -> float:
+        '''
+        :return: a uniform draw from [0, 1)
+        '''
+        if self._position == self.block_size:
+            self._refill()
+        value = self._block[self._position]
+        self._position += 1
+        return value
+
+    def integer(self, high: int) -> int:
+        '''
+        :param high: the exclusive upper bound
+        :return: a uniform integer from [0, high)
+        '''
+        return int(self.random() * high)
+
+    def getstate(self) -> Dict[str, Any]:
+        # the block is redrawn from where it started, then array draws carry on from the current state
+        return {'block': self._block_state, 'position': self._position, 'state': self.generator.bit_generator.state}
+
+    def setstate(self, state: Dict[str, Any]) -> None:
+        self.generator.bit_generator.state = state['block']
+        self._refill()
+        self._position = state['position']
+        self.generator.bit_generator.state = state['state']
@@ -0,0 +1,160 @@
+import sys
+import math
+import argparse
+
+import numpy as np
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+
+from src.track import Track
+from src.render import Renderer
+from src.races import QLearning, SARSA
+
+Learner = Union[QLearning, SARSA]
+
+# the range each hyperparameter is drawn from and whether to draw it on a log scale
+SPACE: Dict[str, Tuple[float, float, bool]] = {
+    'epsilon': (0.05, 0.6, False),
+    'decay': (1e-4, 1e-2, True),
+    'learning_rate': (0.05, 1.0, True),
+    'gamma': (0.8, 0.999, False)
+}
+WINDOW: int = 20
+
+
+def sample_configs(count: int, space: Dict[str, Tuple[float, float, bool]] = SPACE, seed: Optional[int] = None) -> List[Dict[str, float]]:
+    '''
+    Draw random configurations from the search space.
+
+    :param count: the number of configurations
+    :param space: the (low, high, log scale) range of each hyperparameter
+    :param seed: seeds the draws
+    :return: the configurations
+    '''
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(count):
+        config = {}
+        for (name, (low, high, log)) in space.items():
+            config[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))) if log else rng.uniform(low, high))
+        configs.append(config)
+    return configs
+
+
+def recent_loss(learner: Learner) -> float:
+    '''
+    Score a learner by the mean length of its last WINDOW episodes.
+
+    :param learner: the learner
+    :return: the score, lower is better
+    '''
+    return float(np.mean(learner.loss_values[-WINDOW:])) if learner.loss_values else float('inf')
+
+
+def successive_halving(
+    learner_class: Type[Learner],
+    track: Track,
+    configs: List[Dict[str, Any]],
+    min_episodes: int,
+    max_episodes: int,
+    eta: int = 3,
+    score: Callable[[Learner], float] = recent_loss,
+    seed: Optional[int] = None
+) -> List[Tuple[float, Dict[str, Any], Learner]]:
+    '''
+    Train every configuration for min_episodes, then repeatedly keep the best
+    1 / eta of them and train the survivors on up to eta times the episodes,
+    until one is left or max_episodes is reached. Survivors are paused and
+    resumed in place, so none of their earlier training is repeated.
+
+    :param learner_class: QLearning or SARSA
+    :param track: the track to train on
+    :param configs: the keyword arguments of every candidate learner
+    :param min_episodes: the episodes every candidate is trained for
+    :param max_episodes: the most episodes any candidate is trained for
+    :param eta: the reduction factor between rounds
+    :param score: scores a trained learner, lower is better
+    :param seed: seeds the candidates' independent random streams
+    :return: the (score, configuration, learner) of the candidates that
+             reached the last round, best first
+    '''
+    seeds = np.random.SeedSequence(seed).spawn(len(configs))
+    candidates = [
+        (config, learner_class(track, renderer=Renderer(), checkpoint_every=0, seed=seeds[i], **dict(config, training_iters=max_episodes)))
+        for (i, config) in enumerate(configs)
+    ]
+    budget = min_episodes
+    while True:
+        for (_, learner) in candidates:
+            learner.train(episodes=budget - learner.episode)
+        ranked = sorted(((score(learner), config, learner) for (config, learner) in candidates), key=lambda result: result[0])
+
+        if len(ranked) <= 1 or budget >= max_episodes:
+            return ranked
+        candidates = [(config, learner) for (_, config, learner) in ranked[:max(1, len(ranked) // eta)]]
+        budget = min(budget * eta, max_episodes)
+
+
+def hyperband(
+    learner_class: Type[Learner],
+    track: Track,
+    min_episodes: int,
+    max_episodes: int,
+    eta: int = 3,
+    space: Dict[str, Tuple[float, float, bool]] = SPACE,
+    seed: Optional[int] = None,
+    score: Callable[[Learner], float] = recent_loss
+) -> List[Tuple[float, Dict[str, Any], Learner]]:
+    '''
+    Run successive halving brackets that trade off the number of sampled
+    configurations against the episodes each one starts with.
+
+    :param learner_class: QLearning or SARSA
+    :param track: the track to train on
+    :param min_episodes: the smallest starting budget of any bracket
+    :param max_episodes: the most episodes any candidate is trained for
+    :param eta: the reduction factor between rounds
+    :param space: the search space
+    :param seed: seeds the configurations and the training
+    :param score: scores a trained learner, lower is better
+    :return: the finalists of every bracket, best first
+    '''
+    brackets = int(math.log(max_episodes / min_episodes, eta) + 1e-9)
+    finalists = []
+    for s in reversed(range(brackets + 1)):
+        count = int(math.ceil((brackets + 1) / (s + 1) * eta ** s))
+        bracket_seed = None if seed is None else seed + s
+        configs = sample_configs(count, space, bracket_seed)
+        budget = max(min_episodes, int(max_episodes / eta ** s))
+        finalists += successive_halving(learner_class, track, configs, budget, max_episodes, eta, score, bracket_seed)
+    return sorted(finalists, key=lambda result: result[0])
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Search learner hyperparameters with successive halving.')
+    parser.add_argument('algorithm', choices=['QLearning', 'SARSA'])
+    parser.add_argument('trackfile')
+    parser.add_argument('--configs', type=int, default=27, help='configurations to sample (successive halving only)')
+    parser.add_argument('--min-episodes', type=int, default=10)
+    parser.add_argument('--max-episodes', type=int, default=270)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--hyperband', action='store_true', help='run every hyperband bracket')
+    args = parser.parse_args(argv)
+
+    learner_class = {'QLearning': QLearning, 'SARSA': SARSA}[args.algorithm]
+    track = Track.from_file(args.trackfile)
+    if args.hyperband:
+        results = hyperband(learner_class, track, args.min_episodes, args.max_episodes, args.eta, seed=args.seed)
+    else:
+        configs = sample_configs(args.configs, seed=args.seed)
+        results = successive_halving(learner_class, track, configs, args.min_episodes, args.max_episodes, args.eta, seed=args.seed)
+
+    for (score, config, learner) in results:
+        settings = ' '.join(f'{name}={value:.4g}' for (name, value) in config.items())
+        print(f'{score:10.1f}  episodes={learner.episode}  {settings}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
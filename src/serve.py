@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import src
+from src.rng import RandomStream
+from src.track import Track
+from src.states import StateIndex, V_MIN, V_MAX
+from src.transitions import action_column, NO_ACCEL, N_ACTIONS, STAY
+
+MAX_BATCH: int = int(os.environ.get('MAX_BATCH', 4096))
+MAX_DELAY: float = float(os.environ.get('MAX_DELAY', 0.0))
+
+# the (a_x, a_y) acceleration of every action column
+ACCELERATIONS: np.ndarray = np.array([divmod(column, 3) for column in range(N_ACTIONS)], dtype=np.int64) - 1
+
+
+class CompiledPolicy:
+    '''
+    A frozen greedy policy: one int8 action column per state of an index.
+    States outside the index get NO_ACCEL, i.e. the car coasts.
+    '''
+
+    def __init__(self, index: StateIndex, actions: np.ndarray):
+        self.index: StateIndex = index
+        self.actions: np.ndarray = np.asarray(actions, dtype=np.int8)
+
+    @classmethod
+    def from_learner(cls, learner) -> CompiledPolicy:
+        return cls(learner.track.state_index, learner.greedy_policy())
+
+    @classmethod
+    def load(cls, path: str) -> CompiledPolicy:
+        with np.load(path) as data:
+            x_max, y_max = data['shape'].tolist()
+            return cls(StateIndex(x_max, y_max, data['states']), data['actions'])
+
+    def save(self, path: str) -> None:
+        np.savez(path, shape=np.array(self.index._cells.shape), states=self.index.states, actions=self.actions)
+
+    def lookup(self, states: np.ndarray) -> np.ndarray:
+        '''
+        Look up the accelerations for an (n, 4) array of states.
+
+        :param states: the (x, y, v_x, v_y) states
+        :return: the (n, 2) array of (a_x, a_y) accelerations
+        '''
+        x_max, y_max = self.index._cells.shape
+        valid = (
+            (states[:, 0] >= 0) & (states[:, 0] < x_max) & (states[:, 1] >= 0) & (states[:, 1] < y_max)
+            & (states[:, 2:] >= V_MIN).all(axis=1) & (states[:, 2:] <= V_MAX).all(axis=1)
+        )
+        indices = self.index.lookup(np.where(valid[:, None], states, 0))
+        found = valid & (indices >= 0)
+        columns = np.where(found, self.actions[np.where(found, indices, 0)], NO_ACCEL)
+        return ACCELERATIONS[columns]
+
+
+class PolicyServer:
+    '''
+    Answers state -> acceleration requests from many coroutines by queueing
+    them and resolving everything that arrived in the same turn of the event
+    loop (or within max_delay) with a single vectorized lookup.
+    '''
+
+    def __init__(self, policy: CompiledPolicy, max_batch: int = MAX_BATCH, max_delay: float = MAX_DELAY):
+        self.policy: CompiledPolicy = policy
+        self.max_batch: int = max_batch
+        self.max_delay: float = max_delay
+        self.requests: int = 0
+        self.batches: int = 0
+        self._states: List[Tuple[int, int, int, int]] = []
+        self._futures: List[asyncio.Future] = []
+        self._scheduled: bool = False
+
+    async def act(self, state: Tuple[int, int, int, int]) -> Tuple[int, int]:
+        '''
+        :param state: the car's (x, y, v_x, v_y)
+        :return: the (a_x, a_y) acceleration the policy takes
+        '''
+        # reject malformed states here so they cannot fail the batch they would join
+        if not isinstance(state, (tuple, list, np.ndarray)) or len(state) != 4 or not all(isinstance(v, (int, np.integer)) for v in state):
+            raise ValueError(f'Expected an (x, y, v_x, v_y) state of integers, got {state!r}')
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._states.append(state)
+        self._futures.append(future)
+
+        if len(self._states) >= self.max_batch:
+            self._flush()
+        elif not self._scheduled:
+            self._scheduled = True
+            if self.max_delay > 0:
+                loop.call_later(self.max_delay, self._flush)
+            else:
+                loop.call_soon(self._flush)
+        return await future
+
+    async def act_many(self, states: Sequence[Tuple[int, int, int, int]]) -> np.ndarray:
+        '''
+        :param states: the (x, y, v_x, v_y) of several cars
+        :return: the (n, 2) array of their accelerations
+        '''
+        self.requests += len(states)
+        self.batches += 1
+        return self.policy.lookup(np.array(states, dtype=np.int64).reshape(-1, 4))
+
+    def _flush(self) -> None:
+        self._scheduled = False
+        if not self._states:
+            return
+        states, futures = self._states, self._futures
+        self._states, self._futures = [], []
+
+        try:
+            accelerations = self.policy.lookup(np.array(states, dtype=np.int64)).tolist()
+        except Exception as error:
+            # fail every request of the batch rather than leave them waiting forever
+            for future in futures:
+                if not future.cancelled():
+                    future.set_exception(error)
+            return
+        for (future, (a_x, a_y)) in zip(futures, accelerations):
+            if not future.cancelled():
+                future.set_result((a_x, a_y))
+        self.requests += len(states)
+        self.batches += 1
+
+
+async def drive(server: PolicyServer, track: Track, rng: RandomStream, requests: int, latencies: List[float]) -> None:
+    '''
+    An in-process client: a car that asks the server for every move and
+    steps itself with the track's transition table.
+
+    :param server: the policy server
+    :param track: the track the policy was compiled for
+    :param rng: the client's random stream
+    :param requests: the number of moves to make
+    :param latencies: where to record the time each request took
+    '''
+    index, transitions = track.state_index, track.transitions
+    x, y = track.random_start(rng)
+    state = index.index(x, y, 0, 0)
+    for _ in range(requests):
+        start = time.perf_counter()
+        a_x, a_y = await server.act(index.state(state))
+        latencies.append(time.perf_counter() - start)
+
+        column = action_column(a_x, a_y) if rng.random() < 0.8 else STAY
+        state, _, finished = transitions.step(state, column)
+        if finished:
+            x, y = track.random_start(rng)
+            state = index.index(x, y, 0, 0)
+
+
+async def simulate(server: PolicyServer, track: Track, clients: int, requests: int, seed: Any = None) -> Dict[str, float]:
+    '''
+    Drive many concurrent in-process clients against a server.
+
+    :param server: the policy server
+    :param track: the track the policy was compiled for
+    :param clients: the number of concurrent clients
+    :param requests: the number of requests each client makes
+    :param seed: seeds the clients' random streams
+    :return: the throughput, latency percentiles and mean batch size
+    '''
+    latencies: List[float] = []
+    seeds = np.random.SeedSequence(seed).spawn(clients)
+    requests_before, batches_before = server.requests, server.batches
+
+    start = time.perf_counter()
+    await asyncio.gather(*(drive(server, track, RandomStream(seeds[i]), requests, latencies) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    served, batches = server.requests - requests_before, server.batches - batches_before
+    return {
+        'requests_per_sec': served / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)) * 1e3,
+        'p99_ms': float(np.percentile(latencies, 99)) * 1e3,
+        'mean_batch': served / batches if batches else 0.0
+    }
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description='Serve a trained policy to simulated in-process clients.')
+    parser.add_argument('algorithm', choices=['QLearning', 'DynaQ', 'QLambda', 'SARSA', 'SARSALambda', 'ValueIteration'])
+    parser.add_argument('trackfile')
+    parser.add_argument('checkpoint', nargs='?', help='the checkpoint to serve, otherwise the learner is trained first')
+    parser.add_argument('--save', help='write the compiled policy to this .npz file')
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=1000, help='requests per client')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    learner = getattr(src, args.algorithm)(args.trackfile)
+    if args.checkpoint:
+        learner.load(args.checkpoint)
+    else:
+        learner.train()
+    policy = CompiledPolicy.from_learner(learner)
+    if args.save:
+        policy.save(args.save)
+
+    stats = asyncio.run(simulate(PolicyServer(policy), learner.track, args.clients, args.requests, args.seed))
+    print(' '.join(f'{name}={value:.4g}' for (name, value) in stats.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import numpy as np
+
+from typing import Tuple
+
+# the car only ever accepts velocities strictly between -5 and 5
+V_MIN: int = -4
+V_MAX: int = 4
+N_VELOCITIES: int = V_MAX - V_MIN + 1
+
+
+class StateIndex:
+    '''
+    Maps (x, y, v_x, v_y) states onto a contiguous range of integers so that
+    per-state values can be held in flat arrays instead of dicts. States are
+    numbered in (x, y, v_x, v_y) order and looked up through a cell table
+    followed by a velocity table for the cells that hold any state.
+    '''
+
+    def __init__(self, x_max: int, y_max: int, states: np.ndarray):
+        order = np.lexsort(states.T[::-1])
+        self.states: np.ndarray = states[order].astype(np.int32)
+
+        # number the cells that hold at least one state
+        cells, cell_of_state = np.unique(self.states[:, 0] * y_max + self.states[:, 1], return_inverse=True)
+        self._cells: np.ndarray = np.full((x_max, y_max), -1, dtype=np.int32)
+        self._cells.flat[cells] = np.arange(len(cells), dtype=np.int32)
+
+        # then the velocities held at each of those cells
+        self._velocities: np.ndarray = np.full((len(cells), N_VELOCITIES, N_VELOCITIES), -1, dtype=np.int32)
+        self._velocities[cell_of_state, self.states[:, 2] - V_MIN, self.states[:, 3] - V_MIN] = np.arange(len(self.states))
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    @property
+    def nbytes(self) -> int:
+        return self.states.nbytes + self._cells.nbytes + self._velocities.nbytes
+
+    def index(self, x: int, y: int, v_x: int, v_y: int) -> int:
+        '''
+        Get the integer index of a state.
+
+        :param x: the x position
+        :param y: the y position
+        :param v_x: the x velocity
+        :param v_y: the y velocity
+        :return: the index of the state, or -1 if it is not indexed
+        '''
+        cell = self._cells[x, y]
+        if cell < 0:
+            return -1
+        return int(self._velocities[cell, v_x - V_MIN, v_y - V_MIN])
+
+    def lookup(self, states: np.ndarray) -> np.ndarray:
+        '''
+        Vectorized form of index over an (n, 4) array of states.
+
+        :param states: the states to look up
+        :return: the index of each state, or -1 where it is not indexed
+        '''
+        cells = self._cells[states[:, 0], states[:, 1]]
+        indices = self._velocities[cells, states[:, 2] - V_MIN, states[:, 3] - V_MIN]
+        return np.where(cells < 0, -1, indices)
+
+    def state(self, i: int) -> Tuple[int, int, int, int]:
+        x, y, v_x, v_y = self.states[i]
+        return int(x), int(y), int(v_x), int(v_y)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import os
+
+import numpy as np
+
+from typing import NamedTuple, Optional, Tuple, Union
+
+from src.states import StateIndex
+
+PRECISION: str = os.environ.get('PRECISION', 'float64').lower()
+DTYPES = {'float64': np.float64, 'float32': np.float32, 'float16': np.float16, 'int16': np.int16}
+# fixed-point tables can hold values up to this many times the expected bound
+HEADROOM: float = 2.0
+
+
+def value_bound(gamma: float, horizon: int) -> float:
+    '''
+    The largest magnitude a discounted return of unit rewards can reach.
+
+    :param gamma: the discount factor
+    :param horizon: the most steps an episode runs for
+    :return: the bound
+    '''
+    return float(horizon) if gamma >= 1 else (1 - gamma ** horizon) / (1 - gamma)
+
+
+class Precision(NamedTuple):
+    '''
+    How a table stores its values: the dtype and the value of one stored unit.
+    Floating point tables store values as they are, while int16 tables store
+    them as fixed-point multiples of the scale. Learners update tables in
+    stored units and write the results back through store, so fixed-point
+    updates are rounded to the nearest unit and saturate at the dtype's range
+    rather than wrapping around.
+    '''
+    dtype: type = np.float64
+    scale: float = 1.0
+
+    @classmethod
+    def named(cls, name: str, bound: float = 1.0) -> Precision:
+        '''
+        :param name: float64, float32, float16 or int16
+        :param bound: the largest magnitude the values are expected to reach,
+                      which sets the fixed-point scale
+        :return: the precision
+        '''
+        if name not in DTYPES:
+            raise ValueError(f'Unknown precision: {name}')
+        dtype = DTYPES[name]
+        if np.issubdtype(dtype, np.integer):
+            return cls(dtype, HEADROOM * bound / np.iinfo(dtype).max)
+        return cls(dtype)
+
+    @property
+    def name(self) -> str:
+        return next(name for (name, dtype) in DTYPES.items() if dtype == self.dtype)
+
+    @property
+    def fixed(self) -> bool:
+        return bool(np.issubdtype(self.dtype, np.integer))
+
+    def resolution(self, bound: float) -> float:
+        '''
+        :param bound: the largest magnitude the values reach
+        :return: the widest gap between neighbouring stored values up to the bound
+        '''
+        return self.scale if self.fixed else float(np.spacing(self.dtype(bound)))
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        '''
+        :param values: the values to store
+        :return: the stored values, rounded and clipped to the dtype when fixed-point
+        '''
+        if self.fixed:
+            return self.store(np.asarray(values) / self.scale).astype(self.dtype)
+        return np.asarray(values, dtype=self.dtype)
+
+    def store(self, units: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+        '''
+        Prepare values already in stored units, such as the result of an
+        update, to be written into a table. Writing into a table casts them
+        to its dtype, so only fixed-point values need any work.
+
+        :param units: the values in stored units
+        :return: the values, rounded and clipped to the dtype's range when fixed-point
+        '''
+        if not self.fixed:
+            return units
+        info = np.iinfo(self.dtype)
+        if np.ndim(units) == 0:
+            # single updates are the hot path, where numpy's overhead dominates
+            return min(max(round(float(units)), info.min), info.max)
+        return np.rint(units).clip(info.min, info.max)
+
+    def decode(self, stored: np.ndarray) -> np.ndarray:
+        '''
+        :param stored: the stored values
+        :return: the values as float64
+        '''
+        values = np.asarray(stored, dtype=np.float64)
+        return values * self.scale if self.fixed else values
+
+
+class QTable:
+    '''
+    Action values for the 3x3 acceleration grid of every state in an index,
+    held as one contiguous (states, 3, 3) array in stored units of its precision.
+    '''
+
+    def __init__(self, index: StateIndex, values: np.ndarray, precision: Optional[Precision] = None):
+        self.index: StateIndex = index
+        self.values: np.ndarray = values
+        self.precision: Precision = precision if precision is not None else Precision(values.dtype.type)
+
+    @classmethod
+    def random(
+        cls,
+        index: StateIndex,
+        scale: float = 1.0,
+        generator: Optional[np.random.Generator] = None,
+        precision: Precision = Precision()
+    ) -> QTable:
+        '''
+        Create a table initialized with uniform random values.
+
+        :param index: the states the table covers
+        :param scale: multiplier applied to the [0, 1) random values
+        :param generator: the generator to draw from, defaults to a fresh one
+        :param precision: how the values are stored
+        :return: the table
+        '''
+        generator = generator if generator is not None else np.random.default_rng()
+        return cls(index, precision.encode(scale * generator.random((len(index), 3, 3))), precision)
+
+    def __getitem__(self, state: Tuple[int, int, int, int]) -> np.ndarray:
+        return self.values[self.index.index(*state)]
+
+    def greedy(self) -> np.ndarray:
+        '''
+        Get the best action column (3 * ai_x + ai_y) of every state.
+
+        :return: the int8 action column per state index
+        '''
+        return self.values.reshape(len(self.values), -1).argmax(axis=1).astype(np.int8)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.index.nbytes
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+
+from typing import Tuple
+
+TRACE_THRESHOLD: float = float(os.environ.get('TRACE_THRESHOLD', 0.01))
+
+
+class EligibilityTraces:
+    '''
+    Sparse replacing eligibility traces. Only the state-action pairs whose
+    trace is at least the threshold are kept, as parallel arrays of flat pair
+    indices (state * 9 + action column) and trace values, so an update only
+    touches the recently visited part of the Q table.
+    '''
+
+    def __init__(self, threshold: float = TRACE_THRESHOLD, capacity: int = 64):
+        self.threshold: float = threshold
+        self.pairs: np.ndarray = np.empty(capacity, dtype=np.int64)
+        self.values: np.ndarray = np.empty(capacity, dtype=np.float64)
+        self.size: int = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def clear(self) -> None:
+        self.size = 0
+
+    def visit(self, pair: int) -> None:
+        '''
+        Set the trace of a state-action pair to 1.
+
+        :param pair: the flat index of the state-action pair
+        '''
+        found = np.flatnonzero(self.pairs[:self.size] == pair)
+        if len(found):
+            self.values[found[0]] = 1.0
+            return
+
+        if self.size == len(self.pairs):
+            self.pairs = np.concatenate([self.pairs, np.empty_like(self.pairs)])
+            self.values = np.concatenate([self.values, np.empty_like(self.values)])
+        self.pairs[self.size], self.values[self.size] = pair, 1.0
+        self.size += 1
+
+    def decay(self, factor: float) -> None:
+        '''
+        Scale every trace and drop the ones that fall below the threshold.
+
+        :param factor: the decay factor (gamma * lambda)
+        '''
+        values = self.values[:self.size]
+        values *= factor
+        keep = values >= self.threshold
+        if not keep.all():
+            size = int(keep.sum())
+            self.pairs[:size] = self.pairs[:self.size][keep]
+            self.values[:size] = values[keep]
+            self.size = size
+
+    def active(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        :return: views of the pair indices and traces currently held
+        '''
+        return self.pairs[:self.size], self.values[:self.size]
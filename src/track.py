@@ -1,10 +1,20 @@
 from __future__ import annotations
 
-import copy
+import os
 import math
-import random
 
-from typing import Tuple, List
+import numpy as np
+
+from typing import Dict, Tuple, List, Optional, Sequence, Union
+
+from src.rng import RandomStream
+from src.states import StateIndex
+from src.transitions import TransitionTable
+from src.instrument import profiler
+
+TRACK_CACHE: bool = os.environ.get('TRACK_CACHE', 'true').lower() == 'true'
+CACHE_VERSION: int = 1
+SYMBOLS: str = '#.SF'
 
 
 class Track:
@@ -13,71 +23,182 @@ class Track:
         self,
         x_max: int,
         y_max: int,
-        grid: List[List[bool]],
-        start: List[Tuple[int, int]],
-        finish: List[Tuple[int, int]]
+        grid: Union[List[List[bool]], np.ndarray],
+        start: Union[Sequence[Tuple[int, int]], np.ndarray],
+        finish: Union[Sequence[Tuple[int, int]], np.ndarray]
     ):
         self._x_max: int = x_max
         self._y_max: int = y_max
-        self._track: List[List[bool]] = grid
-        self._starting_points: List[Tuple[int, int]] = start
-        self._finishing_points: List[Tuple[int, int]] = finish
+
+        # walls and finish cells as (x_max, y_max) masks, starting points as an (n, 2) array
+        drivable = np.zeros((x_max, y_max), dtype=bool)
+        if isinstance(grid, np.ndarray):
+            drivable[:] = grid
+        else:
+            for (x, row) in enumerate(grid[:x_max]):
+                drivable[x, :len(row)] = row[:y_max]
+        self.walls: np.ndarray = ~drivable
+        self.starts: np.ndarray = np.asarray(start, dtype=np.int64).reshape(-1, 2)
+        finish = np.asarray(finish, dtype=np.int64).reshape(-1, 2)
+        self.finish: np.ndarray = np.zeros((x_max, y_max), dtype=bool)
+        self.finish[finish[:, 0], finish[:, 1]] = True
+
+        # flat byte copies of the masks, which are quicker to probe one cell at a time
+        self._wall_cells: bytes = self.walls.tobytes()
+        self._finish_cells: bytes = self.finish.tobytes()
+
+        self._starting_points: List[Tuple[int, int]] = [(x, y) for (x, y) in self.starts.tolist()]
+        self._transitions: Optional[TransitionTable] = None
+        self._frame: Optional[List[str]] = None
+        self._nearest: Dict[Tuple[int, int, int, int], Tuple[int, int]] = {}
+        self._offsets_table: List[Tuple[int, int, int]] = []
+        self._offsets_radius_sq: int = -1
+        self.rng: RandomStream = RandomStream()
 
     @property
     def starting_point(self) -> Tuple[int, int]:
-        return self._starting_points[random.randint(0, len(self._starting_points) - 1)]
+        return self.random_start(self.rng)
+
+    def random_start(self, rng: RandomStream) -> Tuple[int, int]:
+        return self._starting_points[rng.integer(len(self._starting_points))]
+
+    @property
+    def state_index(self) -> StateIndex:
+        '''
+        The compact index of every state reachable from the starting points.
+        '''
+        return self.transitions.index
+
+    @property
+    def transitions(self) -> TransitionTable:
+        if self._transitions is None:
+            self._transitions = TransitionTable.reachable(self)
+        return self._transitions
 
     @classmethod
-    def from_file(cls, filepath: str) -> Track:
-        # define the default variable values
-        track: List[List[bool]] = []
-        start: List[Tuple[int, int]] = []
-        finish: List[Tuple[int, int]] = []
+    def from_file(cls, filepath: str, cache: bool = TRACK_CACHE) -> Track:
+        '''
+        Load a track, reusing the compiled .npz next to the file as long as
+        the file has not changed since it was compiled.
+
+        :param filepath: the track file
+        :param cache: whether to read and write the compiled track
+        :return: the track
+        '''
+        compiled = os.path.splitext(filepath)[0] + '.npz'
+        source = os.stat(filepath)
+        stamp = np.array([source.st_mtime_ns, source.st_size, CACHE_VERSION], dtype=np.int64)
 
-        # read track from the file
+        if cache and os.path.exists(compiled):
+            try:
+                with np.load(compiled) as data:
+                    if np.array_equal(data['stamp'], stamp):
+                        x_max, y_max = data['walls'].shape
+                        return cls(x_max, y_max, ~data['walls'], data['starts'], data['finish'])
+            except (OSError, KeyError, ValueError):
+                pass
+
+        track = cls.parse(filepath)
+        if cache:
+            try:
+                track.compile(compiled, stamp)
+            except OSError:
+                pass
+        return track
+
+    @classmethod
+    def parse(cls, filepath: str) -> Track:
+        '''
+        Read a track file: an "x_max,y_max" header followed by one row per
+        line of # (wall), . (track), S (start) and F (finish).
+
+        :param filepath: the track file
+        :return: the track
+        '''
         with open(filepath) as racetrack:
             lines = [l.strip() for l in racetrack.readlines()]
+        x_max, y_max = (int(size) for size in lines[0].split(','))
+        rows = lines[1:]
+
+        unknown = set(''.join(rows)) - set(SYMBOLS)
+        if unknown:
+            raise ValueError(f'Unrecognized symbol: {min(unknown)}')
+
+        # read every row at once when the file is rectangular
+        if len(rows) == x_max and all(len(row) == y_max for row in rows):
+            symbols = np.frombuffer(''.join(rows).encode('ascii'), dtype='S1').reshape(x_max, y_max)
+        else:
+            symbols = np.full((x_max, y_max), b'#', dtype='S1')
+            for (x, row) in enumerate(rows[:x_max]):
+                row = row[:y_max]
+                symbols[x, :len(row)] = np.frombuffer(row.encode('ascii'), dtype='S1')
 
-            # read the size of the track
-            x_max, y_max = lines[0].split(',')
-
-            # read the track info
-            for i in range(1, len(lines)):
-                row: List[bool] = []
-                for j in range(len(lines[i])):
-                    if lines[i][j] == '#':
-                        row.append(False)
-                    elif lines[i][j] == '.':
-                        row.append(True)
-                    elif lines[i][j] == 'S':
-                        row.append(True)
-                        start.append((i - 1, j))
-                    elif lines[i][j] == 'F':
-                        row.append(True)
-                        finish.append((i - 1, j))
-                    else:
-                        raise ValueError(f'Unrecognized symbol: {lines[i][j]}')
-                track.append(row)
-
-        return cls(int(x_max), int(y_max), track, start, finish)
+        return cls(x_max, y_max, symbols != b'#', np.argwhere(symbols == b'S'), np.argwhere(symbols == b'F'))
+
+    def compile(self, path: str, stamp: np.ndarray) -> None:
+        '''
+        Write the track's masks to an .npz file, swapping it in whole so that
+        concurrent loaders never read a partial file.
+
+        :param path: the compiled track file
+        :param stamp: identifies the source file the track was read from
+        '''
+        staging = f'{path}.{os.getpid()}.tmp'
+        with open(staging, 'wb') as f:
+            np.savez(f, stamp=stamp, walls=self.walls, starts=self.starts, finish=np.argwhere(self.finish))
+        os.replace(staging, path)
+
+    def to_file(self, filepath: str) -> None:
+        '''
+        Write the track in the same text format parse reads.
+
+        :param filepath: the track file
+        '''
+        symbols = np.where(self.walls, b'#', b'.').astype('S1')
+        symbols[self.finish] = b'F'
+        symbols[self.starts[:, 0], self.starts[:, 1]] = b'S'
+        with open(filepath, 'w') as racetrack:
+            racetrack.write(f'{self._x_max},{self._y_max}\n')
+            racetrack.write('\n'.join(row.tobytes().decode('ascii') for row in symbols) + '\n')
+
+    def coarsen(self, factor: int) -> Track:
+        '''
+        Build a lower resolution copy of the track where every factor x factor
+        block of cells becomes one cell. A block is drivable when at least
+        half of its cells are, and lies on the start or finish line when any
+        of its cells does.
+
+        :param factor: the side length of the blocks
+        :return: the coarse track
+        '''
+        x_max, y_max = -(-self._x_max // factor), -(-self._y_max // factor)
+
+        def blocks(mask: np.ndarray) -> np.ndarray:
+            padded = np.zeros((x_max * factor, y_max * factor), dtype=bool)
+            padded[:self._x_max, :self._y_max] = mask
+            return padded.reshape(x_max, factor, y_max, factor)
+
+        finish = blocks(self.finish).any(axis=(1, 3))
+        start = np.zeros((x_max, y_max), dtype=bool)
+        start[self.starts[:, 0] // factor, self.starts[:, 1] // factor] = True
+        if (start & ~finish).any():
+            start &= ~finish
+        drivable = (2 * blocks(~self.walls).sum(axis=(1, 3)) >= factor * factor) | start | finish
+        return Track(x_max, y_max, drivable, np.argwhere(start), np.argwhere(finish))
+
+    @property
+    def frame(self) -> List[str]:
+        '''
+        The rows of the track drawn as text, built once and reused.
+        '''
+        if self._frame is None:
+            self._frame = [row.tobytes().decode('ascii') for row in np.where(self.walls, b'#', b'.')]
+        return self._frame
 
     def print_track(self, x: int, y: int) -> None:
-        output: str = ''
-        track_cpy = copy.deepcopy(self._track)
-        track_cpy[x][y] = 'X'
-        for row in track_cpy:
-            rowstr: str = ''
-            for item in row:
-                if item == 'X':
-                    rowstr += item
-                elif item:
-                    rowstr += '.'
-                else:
-                    rowstr += '#'
-
-            output += rowstr + '\n'
-
-        print(output, end='\r', flush=True)
+        rows = list(self.frame)
+        rows[x] = rows[x][:y] + 'X' + rows[x][y + 1:]
+        print('\n'.join(rows) + '\n', end='\r', flush=True)
 
     def _bresenham(self, x_o, y_o, x, y) -> List[Tuple[int, int]]:
         '''
@@ -134,38 +255,82 @@ class Track:
         :return: a boolean for path validity
         '''
         if x < self._x_max and x >= 0 and y < self._y_max and y >= 0:
+            walls, width = self._wall_cells, self._y_max
             intersected_points = self._bresenham(x_o, y_o, x, y)
             for (x_i, y_i) in intersected_points:
-                if not self._track[x_i][y_i]:
+                if walls[x_i * width + y_i]:
                     return False
             return True
         else:
             return False
 
+    def _offsets(self, radius_sq: int) -> List[Tuple[int, int, int]]:
+        '''
+        Get every (squared distance, dx, dy) offset within the given squared
+        radius, sorted by distance and then by x and y so that walking the
+        list visits cells in the same order the full grid scan prefers them.
+
+        :param radius_sq: the squared radius to cover
+        :return: the sorted offsets
+        '''
+        if radius_sq > self._offsets_radius_sq:
+            # grow geometrically so repeated queries don't keep rebuilding
+            radius_sq = max(radius_sq, 2 * self._offsets_radius_sq)
+            r = math.isqrt(radius_sq)
+            self._offsets_table = sorted(
+                (dx * dx + dy * dy, dx, dy)
+                for dx in range(-r, r + 1)
+                for dy in range(-r, r + 1)
+                if dx * dx + dy * dy <= radius_sq
+            )
+            self._offsets_radius_sq = radius_sq
+        return self._offsets_table
+
+    def _nearest_valid_scan(self, x_o: int, y_o: int, x: int, y: int) -> Optional[Tuple[int, int]]:
+        min_distance, loc = float('inf'), None
+        for i in range(self._x_max):
+            for j in range(self._y_max):
+                if self.is_valid(x_o, y_o, i, j):
+                    distance: float = math.dist((x, y), (i, j))
+                    if distance < min_distance:
+                        min_distance, loc = distance, (i, j)
+        return loc
+
     def nearest_valid(self, x_o: int, y_o: int, x: int, y: int) -> Tuple[int, int]:
         '''
         Find the closest valid point to the desired movement location.
 
+        Since the origin itself is always reachable, the answer lies within
+        the origin's distance of the desired point, so only the cells in that
+        disc are checked (closest first) rather than the whole grid.
+
         :param x_o: the initial x
         :param y_o: the initial y
         :param x: the desired x
         :param y: the desired y
         :return: the closest valid point to move to
         '''
+        profiler.count('nearest_valid')
+        key = (x_o, y_o, x, y)
+        if key in self._nearest:
+            return self._nearest[key]
+
         if self.is_valid(x_o, y_o, x, y):
-            return x, y
+            loc = x, y
+        elif not self.is_valid(x_o, y_o, x_o, y_o):
+            # nothing is reachable from an invalid origin
+            loc = self._nearest_valid_scan(x_o, y_o, x, y)
         else:
-            min_distance, loc = float('inf'), None
-            for i in range(self._x_max):
-                for j in range(self._y_max):
-                    if self.is_valid(x_o, y_o, i, j):
-                        distance: float = math.dist((x, y), (i, j))
-                        if distance < min_distance:
-                            min_distance, loc = distance, (i, j)
-                    else:
-                        continue
-
-            return loc
+            radius_sq = (x - x_o) ** 2 + (y - y_o) ** 2
+            for (distance_sq, dx, dy) in self._offsets(radius_sq):
+                if distance_sq > radius_sq:
+                    break
+                if self.is_valid(x_o, y_o, x + dx, y + dy):
+                    loc = x + dx, y + dy
+                    break
+
+        self._nearest[key] = loc
+        return loc
 
     def reached_finish(self, x_o: int, y_o: int, x: int, y: int) -> bool:
         '''
@@ -177,9 +342,11 @@ class Track:
         :param y: the desired y
         :return: whether or not the car crossed the finish line
         '''
+        finish, width = self._finish_cells, self._y_max
+        inside = 0 <= x_o < self._x_max and 0 <= y_o < self._y_max and 0 <= x < self._x_max and 0 <= y < width
         traversed_coords = self._bresenham(x_o, y_o, x, y)
-        for coord in traversed_coords:
-            if coord in self._finishing_points:
+        for (x_i, y_i) in traversed_coords:
+            if (inside or (0 <= x_i < self._x_max and 0 <= y_i < width)) and finish[x_i * width + y_i]:
                 return True
         return False
 
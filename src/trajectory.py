@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import os
+
+import numpy as np
+
+from typing import Optional
+
+RECORD_TRAJECTORY: bool = os.environ.get('RECORD_TRAJECTORY', 'true').lower() == 'true'
+TRAJECTORY_LIMIT: int = int(os.environ.get('TRAJECTORY_LIMIT', 0))
+
+STEP = np.dtype([
+    ('x', np.int32), ('y', np.int32), ('v_x', np.int8), ('v_y', np.int8),
+    ('a_x', np.int8), ('a_y', np.int8),
+    ('next_x', np.int32), ('next_y', np.int32), ('next_v_x', np.int8), ('next_v_y', np.int8),
+])
+
+
+class Trajectory:
+    '''
+    Step store for an episode backed by a preallocated structured array. It
+    either grows as needed, keeps only the last `limit` steps as a ring
+    buffer, or (with record off) only counts the steps taken.
+    '''
+
+    def __init__(self, capacity: int = 1024, limit: Optional[int] = None, record: bool = True):
+        self.limit: Optional[int] = limit or None
+        self.record: bool = record
+        self._data: np.ndarray = np.empty(min(capacity, self.limit) if self.limit else capacity, dtype=STEP)
+        self._count: int = 0
+
+    @classmethod
+    def from_env(cls) -> Trajectory:
+        return cls(limit=TRAJECTORY_LIMIT, record=RECORD_TRAJECTORY)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, x: int, y: int, v_x: int, v_y: int, a_x: int, a_y: int, next_x: int, next_y: int, next_v_x: int, next_v_y: int) -> None:
+        if self.record:
+            if self.limit:
+                slot = self._count % self.limit
+                if slot >= len(self._data):
+                    self._data = np.resize(self._data, min(2 * len(self._data), self.limit))
+            else:
+                slot = self._count
+                if slot >= len(self._data):
+                    self._data = np.resize(self._data, 2 * len(self._data))
+            self._data[slot] = (x, y, v_x, v_y, a_x, a_y, next_x, next_y, next_v_x, next_v_y)
+        self._count += 1
+
+    def clear(self) -> None:
+        self._count = 0
+
+    def episode(self) -> np.ndarray:
+        '''
+        Get the recorded steps in order. This is a view into the buffer unless
+        a ring buffer has wrapped, in which case it is a reordered copy.
+
+        :return: the structured array of recorded steps
+        '''
+        if not self.record:
+            return self._data[:0]
+        if self.limit and self._count > self.limit:
+            return np.roll(self._data, -(self._count % self.limit))
+        return self._data[:self._count]
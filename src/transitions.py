@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import numpy as np
+
+from typing import Dict, Tuple, TYPE_CHECKING
+
+from src.states import StateIndex
+
+if TYPE_CHECKING:
+    from src.track import Track
+
+# bit flags stored alongside each successor
+CRASHED: int = 1
+FINISHED: int = 2
+
+# the 3x3 acceleration grid flattened row-major, i.e. column = 3 * (a_x + 1) + (a_y + 1)
+N_ACTIONS: int = 9
+
+# the column of the (0, 0) acceleration, which keeps the car's velocity
+NO_ACCEL: int = 4
+
+# the extra outcome column for an acceleration that failed to apply, where
+# the car stays where it is with the same velocity
+STAY: int = N_ACTIONS
+N_OUTCOMES: int = N_ACTIONS + 1
+
+
+def action_column(a_x: int, a_y: int) -> int:
+    return 3 * (a_x + 1) + (a_y + 1)
+
+
+def bresenham(x_o: np.ndarray, y_o: np.ndarray, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Vectorized form of Track._bresenham over arrays of segments.
+
+    :param x_o: the initial xs
+    :param y_o: the initial ys
+    :param x: the desired xs
+    :param y: the desired ys
+    :return: the (steps, segments) xs and ys of the traversed points, and a
+             mask of which of those points belong to each segment
+    '''
+    delta_x, delta_y = x - x_o, y - y_o
+    xp = np.where(delta_x > 0, 1, -1)
+    yp = np.where(delta_y > 0, 1, -1)
+    dx_p, dy_p = np.abs(delta_x), np.abs(delta_y)
+
+    # swap the roles of the axes for the steep segments
+    steep = dx_p <= dy_p
+    major, minor = np.where(steep, dy_p, dx_p), np.where(steep, dx_p, dy_p)
+    x_x, x_y = np.where(steep, 0, xp), np.where(steep, yp, 0)
+    y_x, y_y = np.where(steep, xp, 0), np.where(steep, 0, yp)
+
+    delta = 2 * minor - major
+    y_i = np.zeros_like(major)
+
+    steps = int(major.max(initial=0)) + 1
+    xs = np.empty((steps, len(major)), dtype=np.int64)
+    ys = np.empty((steps, len(major)), dtype=np.int64)
+    for x_i in range(steps):
+        xs[x_i] = x_o + x_i * x_x + y_i * y_x
+        ys[x_i] = y_o + x_i * x_y + y_i * y_y
+        step = delta >= 0
+        y_i = y_i + step
+        delta = delta - 2 * major * step + 2 * minor
+
+    # pad the shorter segments with their origin so every point can be indexed
+    mask = np.arange(steps)[:, None] <= major[None, :]
+    return np.where(mask, xs, x_o), np.where(mask, ys, y_o), mask
+
+
+def successors(track: Track, states: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Compute the outcome of every action from each of the given states, and
+    of staying put when the acceleration fails.
+
+    :param track: the track being driven
+    :param states: the (n, 4) origin states
+    :return: the (n, 10, 4) next states and the (n, 10) CRASHED / FINISHED flags
+    '''
+    cells, finish = ~track.walls, track.finish
+
+    states = states.astype(np.int64)
+    n = len(states)
+    next_states = np.zeros((n, N_OUTCOMES, 4), dtype=np.int64)
+    flags = np.zeros((n, N_OUTCOMES), dtype=np.uint8)
+
+    x_o, y_o, v_xo, v_yo = states.T
+    for column in range(N_ACTIONS):
+        a_x, a_y = divmod(column, 3)
+
+        # apply the acceleration the same way the car does
+        v_x, v_y = v_xo + a_x - 1, v_yo + a_y - 1
+        v_x = np.where((v_x > -5) & (v_x < 5), v_x, v_xo)
+        v_y = np.where((v_y > -5) & (v_y < 5), v_y, v_yo)
+        x, y = x_o + v_x, y_o + v_y
+
+        # trace the movement against walls and the finish line
+        inside = (x >= 0) & (x < track._x_max) & (y >= 0) & (y < track._y_max)
+        xs, ys, _ = bresenham(x_o, y_o, np.where(inside, x, x_o), np.where(inside, y, y_o))
+        valid = inside & np.all(cells[xs, ys], axis=0)
+        crossed = np.any(finish[xs, ys], axis=0)
+
+        next_states[:, column] = np.stack([x, y, v_x, v_y], axis=1)
+        flags[:, column] = np.where(crossed & valid, FINISHED, 0)
+
+        # resolve the crashes to their nearest valid points
+        for i in np.flatnonzero(~valid):
+            x_i, y_i = track.nearest_valid(int(x_o[i]), int(y_o[i]), int(x[i]), int(y[i]))
+            next_states[i, column] = (x_i, y_i, 0, 0)
+            finished = track.reached_finish(int(x_o[i]), int(y_o[i]), x_i, y_i)
+            flags[i, column] = CRASHED | (FINISHED if finished else 0)
+
+    # staying put traces a zero-length segment, which only crosses the finish if the car is on it
+    next_states[:, STAY] = states
+    flags[:, STAY] = np.where(finish[x_o, y_o], FINISHED, 0)
+
+    return next_states, flags
+
+
+class TransitionTable:
+    '''
+    Deterministic successor of every (state, action) pair of a track, stored as
+    a (states, 10) array of next state indices and a matching array of
+    CRASHED / FINISHED flags. The first 9 columns are the accelerations and
+    the last, STAY, is the car staying put when its acceleration fails.
+    Crashes resolve to the nearest valid point.
+    '''
+
+    def __init__(self, track: Track, index: StateIndex, next_state: np.ndarray, flags: np.ndarray):
+        self._track: Track = track
+        self.index: StateIndex = index
+        self.next_state: np.ndarray = next_state
+        self.flags: np.ndarray = flags
+        self._reset_finishes: Dict[Tuple[int, int, int, int], bool] = {}
+
+    @classmethod
+    def reachable(cls, track: Track) -> TransitionTable:
+        '''
+        Build the table over only the states that can be reached from the
+        starting points, found by a breadth-first search under the real
+        dynamics (including crash resets).
+
+        :param track: the track being driven
+        :return: the transition table
+        '''
+        frontier = np.array([(x, y, 0, 0) for (x, y) in track._starting_points], dtype=np.int64).reshape(-1, 4)
+        seen = np.unique(frontier, axis=0)
+        frontier = seen
+
+        visited, outcomes, outcome_flags = [], [], []
+        while len(frontier):
+            next_states, flags = successors(track, frontier)
+            visited.append(frontier)
+            outcomes.append(next_states)
+            outcome_flags.append(flags)
+
+            # expand to the successors that have not been seen yet
+            candidates = np.unique(next_states.reshape(-1, 4), axis=0)
+            known = np.concatenate([seen, candidates])
+            _, first = np.unique(known, axis=0, return_index=True)
+            frontier = known[np.sort(first[first >= len(seen)])]
+            seen = np.concatenate([seen, frontier])
+
+        index = StateIndex(track._x_max, track._y_max, np.concatenate(visited))
+        rows = index.lookup(np.concatenate(visited))
+        next_state = np.empty((len(index), N_OUTCOMES), dtype=np.int32)
+        next_state[rows] = index.lookup(np.concatenate(outcomes).reshape(-1, 4)).reshape(-1, N_OUTCOMES)
+        flags = np.empty((len(index), N_OUTCOMES), dtype=np.uint8)
+        flags[rows] = np.concatenate(outcome_flags)
+        return cls(track, index, next_state, flags)
+
+    def step(self, state: int, column: int) -> Tuple[int, bool, bool]:
+        '''
+        Look up the outcome of taking an action from a state.
+
+        :param state: the index of the current state
+        :param column: the action column (STAY if the acceleration failed)
+        :return: the next state index, whether the car crashed and whether
+                 it crossed the finish line
+        '''
+        flags = self.flags[state, column]
+        return int(self.next_state[state, column]), bool(flags & CRASHED), bool(flags & FINISHED)
+
+    def reset_finish(self, x_o: int, y_o: int, x: int, y: int) -> bool:
+        '''
+        Memoized finish check for crashes that reset the car somewhere other
+        than the stored successor (i.e. back to a starting point).
+
+        :param x_o: the initial x
+        :param y_o: the initial y
+        :param x: the reset x
+        :param y: the reset y
+        :return: whether or not the car crossed the finish line
+        '''
+        key = (x_o, y_o, x, y)
+        if key not in self._reset_finishes:
+            self._reset_finishes[key] = self._track.reached_finish(x_o, y_o, x, y)
+        return self._reset_finishes[key]
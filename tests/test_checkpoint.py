@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pytest
+
+from unittest import mock
+
+from src.render import Renderer
+from src.benchmark import TRACK_DIR
+from src.races import QLearning, SARSA, DynaQ, QLambda, SARSALambda
+
+TRACK: str = os.path.join(TRACK_DIR, 'L-track.txt')
+
+
+def _learner(cls, **kwargs):
+    return cls(TRACK, renderer=Renderer(), checkpoint_every=0, seed=0, training_iters=40, **kwargs)
+
+
+@pytest.mark.parametrize('cls', [QLearning, SARSA, DynaQ, QLambda, SARSALambda])
+def test_resume_is_identical_to_training_straight_through(cls, tmp_path):
+    straight = _learner(cls)
+    straight.train()
+
+    paused = _learner(cls)
+    paused.train(episodes=15)
+    paused.save(str(tmp_path / 'checkpoint'))
+
+    resumed = _learner(cls)
+    resumed.load(str(tmp_path / 'checkpoint'))
+    resumed.train()
+
+    assert resumed.episode == straight.episode
+    assert resumed.epsilon == straight.epsilon
+    assert resumed.loss_values == straight.loss_values
+    assert np.array_equal(resumed.Q.values, straight.Q.values)
+
+
+def test_interrupted_save_keeps_the_last_checkpoint(tmp_path):
+    path = str(tmp_path / 'checkpoint')
+    learner = _learner(QLearning)
+    learner.train(episodes=10)
+    learner.save(path)
+    saved = learner.Q.values.copy()
+
+    # stop the save right after the last checkpoint has been moved aside
+    learner.train(episodes=10)
+    replace = os.replace
+
+    def interrupted(src: str, dst: str) -> None:
+        replace(src, dst)
+        if dst.endswith('.old'):
+            raise KeyboardInterrupt
+
+    with mock.patch('src.checkpoint.os.replace', interrupted), pytest.raises(KeyboardInterrupt):
+        learner.save(path)
+
+    restored = _learner(QLearning)
+    restored.load(path)
+    assert restored.episode == 10
+    assert np.array_equal(restored.Q.values, saved)
+
+    # the next save finishes the swap and replaces it
+    learner.save(path)
+    restored.load(path)
+    assert restored.episode == 20
+    assert not os.path.exists(path + '.old')
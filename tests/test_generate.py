@@ -0,0 +1,38 @@
+import pytest
+
+from src.track import Track
+from src.generate import generate_track
+from src.transitions import FINISHED
+
+
+def test_the_same_seed_generates_the_same_track():
+    first, second = generate_track(48, 64, seed=3), generate_track(48, 64, seed=3)
+    assert (first.walls == second.walls).all()
+    assert (first.finish == second.finish).all()
+    assert (first.starts == second.starts).all()
+    assert not (generate_track(48, 64, seed=4).walls == first.walls).all()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_every_generated_track_can_be_finished(seed: int):
+    track = generate_track(48, 64, seed=seed)
+    assert track.walls[[0, -1], :].all() and track.walls[:, [0, -1]].all()
+    assert len(track.starts) and track.finish.any()
+    assert not track.finish[track.starts[:, 0], track.starts[:, 1]].any()
+    assert (track.transitions.flags & FINISHED).any()
+
+
+def test_generated_tracks_survive_a_round_trip_through_a_file(tmp_path):
+    track = generate_track(40, 40, width=3, curvature=0.0, seed=0)
+    path = str(tmp_path / 'generated-track.txt')
+    track.to_file(path)
+    loaded = Track.from_file(path, cache=False)
+    assert (loaded.walls == track.walls).all()
+    assert (loaded.finish == track.finish).all()
+    assert sorted(map(tuple, loaded.starts.tolist())) == sorted(map(tuple, track.starts.tolist()))
+
+
+def test_tracks_too_small_for_the_corridor_are_refused():
+    with pytest.raises(ValueError):
+        generate_track(16, 16, width=4)
+    assert generate_track(20, 20, width=4, seed=0).walls.shape == (20, 20)
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from src.render import Renderer
+from src.benchmark import TRACK_DIR
+from src.races import QLearning, SARSA, DynaQ, QLambda, SARSALambda
+
+TRACK: str = os.path.join(TRACK_DIR, 'L-track.txt')
+
+
+@pytest.mark.parametrize('cls', [QLearning, SARSA])
+def test_batched_training_stops_at_the_budget(cls):
+    learner = cls(TRACK, renderer=Renderer(), checkpoint_every=0, seed=0, training_iters=101)
+    epsilon = learner.epsilon
+    learner.train_batched(64)
+
+    assert learner.episode == 101
+    assert len(learner.loss_values) == 101
+    assert learner.epsilon == pytest.approx(epsilon - 101 * learner.decay)
+
+
+@pytest.mark.parametrize('cls', [DynaQ, QLambda, SARSALambda])
+def test_batched_training_is_refused_without_its_updates(cls):
+    learner = cls(TRACK, renderer=Renderer(), checkpoint_every=0, seed=0)
+    with pytest.raises(NotImplementedError):
+        learner.train_batched(8)
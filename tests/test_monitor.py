@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+
+from types import SimpleNamespace
+from unittest import mock
+
+from src.rng import RandomStream
+from src.render import Renderer
+from src.benchmark import TRACK_DIR
+from src.hogwild import train_shared
+from src.monitor import ConvergenceMonitor
+from src.races import QLearning
+
+TRACK: str = os.path.join(TRACK_DIR, 'L-track.txt')
+
+
+class Scripted:
+    '''
+    A stand-in learner whose checks score the given steps, with the given
+    greedy policies and Q values.
+    '''
+
+    def __init__(self, checks):
+        self.checks = iter(checks)
+        self.episode, self.max_steps, self.track = 0, 100, None
+        self.Q = SimpleNamespace(values=np.zeros(4))
+
+    def advance(self, monitor: ConvergenceMonitor) -> bool:
+        self.steps, self.policy, self.Q.values[:] = next(self.checks)
+        self.episode += monitor.every
+        return monitor.update(self)
+
+    def greedy_policy(self) -> np.ndarray:
+        return np.array(self.policy)
+
+    def evaluate(self):
+        return SimpleNamespace(mean_steps=self.steps)
+
+
+def test_a_worsening_policy_never_converges():
+    monitor = ConvergenceMonitor(every=1, patience=2)
+    learner = Scripted([(20.0, [0, 0], 1.0)] + [(20.0 + i, [0, 0], 0.0) for i in range(1, 6)])
+    assert not any(learner.advance(monitor) for _ in range(6))
+
+
+def test_a_changing_policy_never_converges():
+    monitor = ConvergenceMonitor(every=1, patience=2)
+    learner = Scripted([(20.0, [i % 2, 0], 0.0) for i in range(6)])
+    assert not any(learner.advance(monitor) for _ in range(6))
+
+
+def test_a_plateau_converges_with_the_best_values_restored():
+    monitor = ConvergenceMonitor(every=1, patience=2)
+    learner = Scripted([(20.0, [0, 0], 1.0), (20.1, [0, 0], 2.0), (20.1, [0, 0], 3.0)])
+    assert [learner.advance(monitor) for _ in range(3)] == [False, False, True]
+    assert (learner.Q.values == 1.0).all()
+
+
+def test_cut_off_rollouts_never_converge():
+    monitor = ConvergenceMonitor(every=1, patience=2)
+    learner = Scripted([(float('inf'), [0, 0], 0.0)] * 4)
+    with mock.patch('src.monitor.rollout_policy', return_value=np.array([10, learner.max_steps])):
+        assert not any(learner.advance(monitor) for _ in range(4))
+    assert all(check['cut_off'] for check in monitor.history)
+
+
+def test_hogwild_stops_early_on_the_best_table():
+    learner = QLearning(TRACK, renderer=Renderer(), checkpoint_every=0, seed=0, training_iters=20000)
+    learner.monitor = ConvergenceMonitor(every=100, patience=1, tolerance=0.5, policy_change=1.0, rollouts=8, rng=RandomStream(0))
+    train_shared(learner, workers=2, seed=0)
+
+    assert learner.converged
+    assert learner.episode < learner.training_iters
+    assert (learner.Q.values == learner.monitor.best_values).all()
+
+
+def test_the_best_values_survive_a_checkpoint():
+    learner = QLearning(TRACK, renderer=Renderer(), checkpoint_every=0, seed=0, early_stopping=True)
+    learner.episode = learner.monitor.every
+    learner.monitor.update(learner)
+    arrays, meta = learner.checkpoint()
+
+    resumed = QLearning(TRACK, renderer=Renderer(), checkpoint_every=0, seed=1, early_stopping=True)
+    resumed.restore(arrays, meta)
+    assert (resumed.monitor.best_values == learner.monitor.best_values).all()
@@ -0,0 +1,66 @@
+import os
+import asyncio
+
+import numpy as np
+import pytest
+
+from unittest import mock
+
+from src.render import Renderer
+from src.benchmark import TRACK_DIR
+from src.races import ValueIteration
+from src.serve import ACCELERATIONS, CompiledPolicy, PolicyServer
+
+
+@pytest.fixture(scope='module')
+def learner() -> ValueIteration:
+    learner = ValueIteration(os.path.join(TRACK_DIR, 'L-track.txt'), renderer=Renderer(), checkpoint_every=0, seed=0)
+    learner.train()
+    return learner
+
+
+def test_compiled_policy_round_trips_through_a_file(learner, tmp_path):
+    policy = CompiledPolicy.from_learner(learner)
+    policy.save(str(tmp_path / 'policy.npz'))
+    loaded = CompiledPolicy.load(str(tmp_path / 'policy.npz'))
+
+    states = learner.track.state_index.states
+    expected = ACCELERATIONS[learner.greedy_policy()]
+    assert np.array_equal(loaded.lookup(states), expected)
+
+    # states the policy never saw coast
+    unknown = np.array([[-1, 0, 0, 0], [0, 0, 9, 9]])
+    assert np.array_equal(loaded.lookup(unknown), np.zeros((2, 2), dtype=np.int64))
+
+
+def test_server_answers_match_the_policy(learner):
+    policy = CompiledPolicy.from_learner(learner)
+    server = PolicyServer(policy, max_batch=16)
+    states = learner.track.state_index.states[:40]
+
+    async def ask():
+        return await asyncio.gather(*(server.act(tuple(state)) for state in states))
+
+    answers = asyncio.run(ask())
+    assert np.array_equal(np.array(answers), policy.lookup(states))
+    assert server.requests == len(states)
+    assert server.batches == 3
+
+
+def test_server_rejects_malformed_states(learner):
+    server = PolicyServer(CompiledPolicy.from_learner(learner))
+    for state in [(1, 2, 3), (1.5, 2, 0, 0), 'abcd', 7]:
+        with pytest.raises(ValueError):
+            asyncio.run(server.act(state))
+
+
+def test_failed_lookup_fails_the_whole_batch(learner):
+    server = PolicyServer(CompiledPolicy.from_learner(learner))
+    state = tuple(learner.track.state_index.states[0])
+
+    async def ask():
+        return await asyncio.wait_for(asyncio.gather(server.act(state), server.act(state), return_exceptions=True), timeout=5)
+
+    with mock.patch.object(server.policy, 'lookup', side_effect=RuntimeError('lookup failed')):
+        answers = asyncio.run(ask())
+    assert all(isinstance(answer, RuntimeError) for answer in answers)
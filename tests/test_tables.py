@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.render import Renderer
+from src.benchmark import TRACK_DIR
+from src.tables import Precision
+from src.races import QLearning
+
+TRACK: str = os.path.join(TRACK_DIR, 'L-track.txt')
+
+
+@pytest.mark.parametrize('units', [2.4, 2.5, 3.5, -2.5, -2.6, 1e6, -1e6])
+def test_fixed_point_store_rounds_and_saturates(units: float):
+    precision = Precision.named('int16', 100.0)
+    stored = np.int16(precision.store(units))
+    assert stored == np.clip(np.rint(units), -32768, 32767)
+    assert stored == precision.store(np.array([units]))[0]
+
+
+def test_floating_point_store_passes_values_through():
+    units = np.array([0.25, -1e6])
+    assert Precision.named('float32').store(units) is units
+
+
+def test_encode_keeps_values_within_half_a_unit():
+    precision = Precision.named('int16', 100.0)
+    values = np.linspace(-100.0, 100.0, 1001)
+    assert np.abs(precision.decode(precision.encode(values)) - values).max() <= precision.scale / 2
+    assert precision.encode(np.array([1e9, -1e9])).tolist() == [32767, -32768]
+
+
+def test_int16_tables_take_a_quarter_of_the_memory():
+    full = QLearning(TRACK, renderer=Renderer(), checkpoint_every=0, seed=0, precision='float64')
+    compact = QLearning(TRACK, renderer=Renderer(), checkpoint_every=0, seed=0, precision='int16')
+    assert compact.Q.values.dtype == np.int16
+    assert compact.memory()['Q'] * 4 == full.memory()['Q']
@@ -0,0 +1,20 @@
+import os
+
+import pytest
+
+from src.rng import RandomStream
+from src.track import Track
+from src.benchmark import TRACK_DIR
+
+
+@pytest.mark.parametrize('name', ['L-track.txt', 'O-track.txt', 'R-track.txt', 'T-track.txt'])
+def test_nearest_valid_matches_full_scan(name: str):
+    track = Track.from_file(os.path.join(TRACK_DIR, name))
+    rng = RandomStream(0)
+    cells = [(x, y) for x in range(track._x_max) for y in range(track._y_max) if not track.walls[x, y]]
+
+    # the fastest cars move 4 cells a step, so aim up to a little beyond that
+    for _ in range(100):
+        x_o, y_o = cells[rng.integer(len(cells))]
+        x, y = x_o + rng.integer(11) - 5, y_o + rng.integer(11) - 5
+        assert track.nearest_valid(x_o, y_o, x, y) == track._nearest_valid_scan(x_o, y_o, x, y)
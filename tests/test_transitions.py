@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from src.car import Car
+from src.rng import RandomStream
+from src.track import Track
+from src.benchmark import TRACK_DIR
+from src.transitions import N_ACTIONS, STAY
+
+
+def drive(track: Track, state, column: int):
+    '''
+    Move a car one step the way the races did before the table, one cell check at a time.
+    '''
+    x_o, y_o, v_x, v_y = state
+    car = Car(x_o, y_o)
+    car.v_x, car.v_y = v_x, v_y
+    if column != STAY:
+        a_x, a_y = divmod(column, 3)
+        car.set_acceleration(a_x - 1, a_y - 1, nondeterministic=False)
+
+    crashed = not track.is_valid(x_o, y_o, car.x, car.y)
+    if crashed:
+        car.x, car.y = track.nearest_valid(x_o, y_o, car.x, car.y)
+        car.zeroize()
+    return car.to_tuple(), crashed, track.reached_finish(x_o, y_o, car.x, car.y)
+
+
+@pytest.mark.parametrize('name', ['L-track.txt', 'O-track.txt', 'R-track.txt', 'T-track.txt'])
+def test_table_matches_the_car_on_the_track(name: str):
+    track = Track.from_file(os.path.join(TRACK_DIR, name))
+    index, table = track.state_index, track.transitions
+    rng = RandomStream(0)
+
+    for _ in range(300):
+        state = rng.integer(len(index))
+        for column in range(N_ACTIONS + 1):
+            next_state, crashed, finished = table.step(state, column)
+            assert (index.state(next_state), crashed, finished) == drive(track, index.state(state), column)
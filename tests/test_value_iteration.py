@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+
+from unittest import mock
+
+from src.render import Renderer
+from src.generate import generate_track
+from src.benchmark import TRACK_DIR
+from src.races import ValueIteration
+
+
+def test_warm_start_solves_the_coarse_track_at_the_same_precision():
+    learner = ValueIteration(generate_track(64, 64, seed=0), renderer=Renderer(), checkpoint_every=0, seed=0, precision='int16', multigrid=1)
+    coarse = []
+    train = ValueIteration.train
+
+    def record(planner):
+        coarse.append(planner)
+        train(planner)
+
+    with mock.patch.object(ValueIteration, 'train', record):
+        learner.warm_start()
+    assert [planner.precision.dtype for planner in coarse] == [np.int16]
+    assert coarse[0].track._x_max == 32
+
+
+def test_small_tracks_are_not_coarsened():
+    learner = ValueIteration(os.path.join(TRACK_DIR, 'R-track.txt'), renderer=Renderer(), checkpoint_every=0, seed=0, multigrid=1)
+    assert learner.warm_start() == 0
+
+
+def test_prioritized_and_sync_policies_evaluate_equal_on_generated_tracks():
+    for seed in (0, 1):
+        track = generate_track(64, 64, seed=seed)
+        sync = ValueIteration(track, renderer=Renderer(), checkpoint_every=0, seed=0, solver='sync')
+        prioritized = ValueIteration(track, renderer=Renderer(), checkpoint_every=0, seed=0, solver='prioritized')
+        sync.train()
+        prioritized.train()
+        assert prioritized.evaluate().mean_steps == sync.evaluate().mean_steps
+        assert prioritized.backups < sync.backups